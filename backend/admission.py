@@ -0,0 +1,121 @@
+"""
+Admission control for bulk uploads.
+
+The backlog is the number of pages queued in pending/processing batches that
+have no result yet (unrasterized PDF/TIFF scans count as one page until they
+are expanded). Throughput is the service rate of the bulk workers: pages
+OCR'd in the last ADMISSION_WINDOW_MINUTES divided by the worker time they took
+(OcrResult.processing_seconds), times the number of bulk workers. Idle time
+therefore doesn't count as slow processing, and results reused from duplicate
+uploads are left out. When the backlog, including the new
+upload, would take longer than ADMISSION_MAX_BACKLOG_SECONDS to drain, the
+upload is rejected with a Retry-After hint; accepted uploads get an ETA.
+"""
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from redis.exceptions import RedisError
+from rq import Worker
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models import Batch, BatchStatus, Image, OcrResult, SourceDocument
+from config import ADMISSION_MAX_BACKLOG_SECONDS, ADMISSION_WINDOW_MINUTES
+from queues import bulk_queue
+from workers.batch_processor import recover_stalled_batches
+
+# Throughput is re-estimated at most this often (seconds)
+THROUGHPUT_TTL = 10.0
+
+_QUEUED_STATUSES = (BatchStatus.PENDING, BatchStatus.PROCESSING)
+
+_lock = threading.Lock()
+_throughput = {"at": 0.0, "value": None}
+
+
+class Admission:
+    """Admission decision for an upload of new_pages pages"""
+
+    __slots__ = ("admitted", "backlog_pages", "pages_per_sec", "eta_seconds", "retry_after")
+
+    def __init__(self, admitted, backlog_pages, pages_per_sec, eta_seconds, retry_after):
+        self.admitted = admitted
+        self.backlog_pages = backlog_pages
+        self.pages_per_sec = pages_per_sec
+        self.eta_seconds = eta_seconds
+        self.retry_after = retry_after
+
+    @property
+    def estimated_completion(self) -> Optional[datetime]:
+        if self.eta_seconds is None:
+            return None
+        return datetime.utcnow() + timedelta(seconds=self.eta_seconds)
+
+
+def backlog_pages(db: Session) -> int:
+    """Pages waiting for OCR in queued or running batches"""
+    # Batches whose worker died would otherwise inflate the backlog forever
+    recover_stalled_batches(db)
+    pages = (
+        db.query(func.count(Image.id))
+        .join(Batch, Image.batch_id == Batch.id)
+        .outerjoin(OcrResult, OcrResult.image_id == Image.id)
+        .filter(Batch.status.in_(_QUEUED_STATUSES), OcrResult.id.is_(None))
+        .scalar()
+    )
+    documents = (
+        db.query(func.count(SourceDocument.id))
+        .join(Batch, SourceDocument.batch_id == Batch.id)
+        .filter(Batch.status.in_(_QUEUED_STATUSES), SourceDocument.rasterized.isnot(True))
+        .scalar()
+    )
+    return (pages or 0) + (documents or 0)
+
+
+def bulk_worker_count() -> int:
+    """Workers serving the bulk lane (at least 1, also when Redis is unreachable)"""
+    try:
+        return max(1, Worker.count(queue=bulk_queue))
+    except RedisError:
+        return 1
+
+
+def estimate_throughput(db: Session) -> Optional[float]:
+    """Pages per second the bulk workers can process, or None without recent work"""
+    now = time.monotonic()
+    with _lock:
+        if now - _throughput["at"] < THROUGHPUT_TTL:
+            return _throughput["value"]
+
+    since = datetime.utcnow() - timedelta(minutes=ADMISSION_WINDOW_MINUTES)
+    completed, busy_seconds = (
+        db.query(func.count(OcrResult.id), func.sum(OcrResult.processing_seconds))
+        .filter(OcrResult.processed_at >= since, OcrResult.processing_seconds.isnot(None))
+        .one()
+    )
+    value = None
+    if completed and busy_seconds:
+        value = completed / busy_seconds * bulk_worker_count()
+
+    with _lock:
+        _throughput.update(at=now, value=value)
+    return value
+
+
+def check_admission(db: Session, new_pages: int) -> Admission:
+    """Decide whether an upload of new_pages pages fits within the backlog SLA"""
+    backlog = backlog_pages(db)
+    rate = estimate_throughput(db)
+    if not rate:
+        # No completed work to estimate from: admit without an ETA
+        return Admission(True, backlog, None, None, 0)
+
+    eta = (backlog + new_pages) / rate
+    if ADMISSION_MAX_BACKLOG_SECONDS > 0 and backlog and eta > ADMISSION_MAX_BACKLOG_SECONDS:
+        # Time until the backlog has drained enough for this upload to fit
+        retry_after = max(1, math.ceil(eta - ADMISSION_MAX_BACKLOG_SECONDS))
+        return Admission(False, backlog, rate, eta, retry_after)
+    return Admission(True, backlog, rate, eta, 0)
@@ -1,42 +1,58 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Query
-from fastapi.responses import Response
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, FileResponse
 from sqlalchemy.orm import Session
 from typing import List
+import asyncio
 import json
-import shutil
+import time
+import uuid
 from pathlib import Path
 from datetime import datetime
-from redis import Redis
 from redis.exceptions import RedisError
-from rq import Queue
 
 from database import get_db, SessionLocal
-from models import Batch, Image, OcrResult, BatchStatus
+from models import Batch, Image, SourceDocument, OcrResult, BatchStatus
 from schemas import BatchResponse, BatchUpdate, ImageResponse
-from config import UPLOAD_DIR, EXPORT_DIR, REDIS_URL
+from config import UPLOAD_DIR, INTERACTIVE_WAIT_SECONDS, INTERACTIVE_JOB_TIMEOUT, BULK_JOB_TIMEOUT
+from queues import interactive_queue, bulk_queue
+from storage import store_upload
+from admission import check_admission
+from export_cache import export_key, get_export, invalidate as invalidate_exports
+from profiling import PROFILE_HEADER, profiling_requested
+from api.http_cache import etag_matches
 import os
-from workers.batch_processor import process_batch
+from workers.batch_processor import process_batch, reset_stalled_batches
+from workers.document_ingest import is_document
 from exporters.csv_exporter import export_single_to_csv
 from exporters.markdown_exporter import export_to_markdown
 
 router = APIRouter(prefix="/api/batches", tags=["batches"])
 
-# Redis queue for async processing
-redis_conn = Redis.from_url(REDIS_URL)
-task_queue = Queue(connection=redis_conn)
-
 @router.post("", response_model=BatchResponse, status_code=201)
 async def create_batch(
+    request: Request,
     images: List[UploadFile] = File(...),
     form_type: str = Query("AUTO"),
     db: Session = Depends(get_db)
 ):
     """
-    Upload multiple images and create a new batch for OCR processing
+    Upload multiple images (or multi-page PDF/TIFF scans) and create a new batch for OCR processing
     """
     if not images:
         raise HTTPException(status_code=400, detail="No images provided")
     
+    # Single images go to the interactive lane; bulk uploads must fit the backlog SLA
+    admission = None
+    if len(images) > 1 or is_document(images[0].filename):
+        admission = check_admission(db, len(images))
+        if not admission.admitted:
+            raise HTTPException(
+                status_code=429,
+                detail=f"OCR backlog is {admission.backlog_pages} pages (~{int(admission.eta_seconds)}s); retry later",
+                headers={"Retry-After": str(admission.retry_after)}
+            )
+    
     # Create batch
     batch = Batch(form_type=form_type)
     db.add(batch)
@@ -47,42 +63,67 @@ async def create_batch(
     batch_dir = UPLOAD_DIR / datetime.now().strftime("%Y-%m-%d") / batch.id
     batch_dir.mkdir(parents=True, exist_ok=True)
     
-    # Save uploaded images
+    # Save uploaded images; PDF/TIFF scans are kept whole and rasterized by the worker
+    page_count = 0
+    document_count = 0
     for idx, upload_file in enumerate(images):
-        # Generate unique filename
         file_ext = Path(upload_file.filename).suffix
+        
+        if is_document(upload_file.filename):
+            file_path = batch_dir / f"source_{idx}{file_ext}"
+            content_hash, _ = store_upload(upload_file.file, file_path)
+            db.add(SourceDocument(
+                batch_id=batch.id,
+                file_path=str(file_path),
+                content_hash=content_hash,
+                upload_index=idx
+            ))
+            document_count += 1
+            continue
+        
+        # Generate unique filename; page_index is the upload position until the
+        # worker expands the scans in between (see rasterize_documents)
         file_path = batch_dir / f"page_{idx}{file_ext}"
         
-        # Save file
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(upload_file.file, buffer)
+        # Save file (deduplicated in the object store, hardlinked into the batch dir)
+        content_hash, _ = store_upload(upload_file.file, file_path)
         
         # Create image record
         image = Image(
             batch_id=batch.id,
             file_path=str(file_path),
-            page_index=idx
+            page_index=idx,
+            content_hash=content_hash
         )
         db.add(image)
+        page_count += 1
     
     db.commit()
     
     # Decide processing mode
     use_sync = os.getenv("SYNC_PROCESSING", "false").lower() == "true"
-    single_image = len(images) == 1
+    single_image = page_count == 1 and document_count == 0
 
     processed_sync = False
+    job_meta = _job_meta(request)
 
     try:
-        if use_sync or single_image:
-            # Immediate processing in the API process for single uploads or when forced sync
-            process_batch(batch.id)
+        if use_sync:
+            # Forced sync: process in the API process (off the event loop)
+            await run_in_threadpool(process_batch, batch.id)
             processed_sync = True
+        elif single_image:
+            # Interactive lane: wait briefly for a dedicated worker, then fall back to async polling
+            job = interactive_queue.enqueue(process_batch, batch.id, job_timeout=INTERACTIVE_JOB_TIMEOUT,
+                                            meta=job_meta, job_id=_assign_job_id(batch, db))
+            processed_sync = await _wait_for_job(job, INTERACTIVE_WAIT_SECONDS)
         else:
-            task_queue.enqueue(process_batch, batch.id, job_timeout='10m')
+            bulk_queue.enqueue(process_batch, batch.id, job_timeout=BULK_JOB_TIMEOUT,
+                               meta=job_meta, job_id=_assign_job_id(batch, db))
     except RedisError:
         # Redis unavailable – fall back to synchronous processing to avoid hanging spinner
-        process_batch(batch.id)
+        _clear_job_id(batch, db)
+        await run_in_threadpool(process_batch, batch.id)
         processed_sync = True
     
     # Return batch info (refresh from DB if processed synchronously)
@@ -94,7 +135,38 @@ async def create_batch(
         finally:
             resp_db.close()
     else:
-        return _build_batch_response(batch, db)
+        response = _build_batch_response(batch, db)
+        if admission is not None:
+            response.estimated_completion = admission.estimated_completion
+        return response
+
+def _assign_job_id(batch: Batch, db: Session) -> str:
+    """Record the RQ job id on the batch before enqueueing, so a dead job can be detected"""
+    batch.job_id = str(uuid.uuid4())
+    db.commit()
+    return batch.job_id
+
+def _clear_job_id(batch: Batch, db: Session):
+    batch.job_id = None
+    db.commit()
+
+def _job_meta(request: Request) -> dict:
+    """RQ job meta for an upload; X-Profile asks the worker to profile the job"""
+    return {"profile": True} if profiling_requested(request.headers.get(PROFILE_HEADER)) else {}
+
+async def _wait_for_job(job, timeout: float) -> bool:
+    """Poll an RQ job until it ends or the timeout expires; True if it finished"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            status = job.get_status(refresh=True)
+        except RedisError:
+            # Job is already queued; let the client poll instead of processing twice
+            return False
+        if status in ("finished", "failed", "stopped", "canceled"):
+            return True
+        await asyncio.sleep(0.25)
+    return False
 
 @router.get("/{batch_id}", response_model=BatchResponse)
 def get_batch(batch_id: str, db: Session = Depends(get_db)):
@@ -107,6 +179,46 @@ def get_batch(batch_id: str, db: Session = Depends(get_db)):
     
     return _build_batch_response(batch, db)
 
+@router.post("/{batch_id}/retry", response_model=BatchResponse, status_code=202)
+async def retry_batch(batch_id: str, request: Request, db: Session = Depends(get_db)):
+    """
+    Re-enqueue a batch so only its failed (or never processed) pages run again.
+    Pages that already have results are skipped by the worker.
+    """
+    batch = db.query(Batch).filter(Batch.id == batch_id).first()
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    
+    # Batches whose job died (OOM, SIGKILL, timeout, deploy) become retryable
+    reset_stalled_batches(db, [batch])
+    if batch.status in (BatchStatus.PENDING, BatchStatus.PROCESSING):
+        raise HTTPException(status_code=409, detail="Batch is still being processed")
+    
+    failed = [image for image in batch.images if image.ocr_result is None]
+    unrasterized = [document for document in batch.documents if not document.rasterized]
+    if not failed and not unrasterized:
+        raise HTTPException(status_code=400, detail="Batch has no failed pages")
+    
+    batch.status = BatchStatus.PENDING
+    batch.error_message = None
+    batch.job_id = str(uuid.uuid4())
+    db.commit()
+    
+    try:
+        queue = interactive_queue if len(failed) == 1 and not unrasterized else bulk_queue
+        queue.enqueue(
+            process_batch, batch.id, retry_failed=True,
+            job_timeout=INTERACTIVE_JOB_TIMEOUT if queue is interactive_queue else BULK_JOB_TIMEOUT,
+            meta=_job_meta(request), job_id=batch.job_id
+        )
+    except RedisError:
+        # Redis unavailable – process in the API process instead
+        _clear_job_id(batch, db)
+        await run_in_threadpool(process_batch, batch.id, True)
+        db.expire_all()
+    
+    return _build_batch_response(batch, db)
+
 @router.put("/{batch_id}", response_model=BatchResponse)
 def update_batch(
     batch_id: str,
@@ -130,19 +242,23 @@ def update_batch(
         existing_data.update(update.data)
         
         ocr_result.data_json = json.dumps(existing_data, ensure_ascii=False)
+        # Edits only touch the OCR result, so bump the batch version for export caching
+        batch.updated_at = datetime.utcnow()
         db.commit()
+        invalidate_exports(batch.id)
     
     return _build_batch_response(batch, db)
 
 @router.get("/{batch_id}/export")
 def export_batch(
     batch_id: str,
+    request: Request,
     format: str = Query("csv", regex="^(csv|md)$"),
     db: Session = Depends(get_db)
 ):
     """
     Export batch results as CSV or Markdown
-    File is saved to server directory and returned for download
+    File is cached in the server export directory until the batch changes
     """
     batch = db.query(Batch).filter(Batch.id == batch_id).first()
     if not batch:
@@ -151,44 +267,40 @@ def export_batch(
     if batch.status != BatchStatus.DONE:
         raise HTTPException(status_code=400, detail="Batch processing not complete")
     
-    # Collect all OCR data
-    all_data = {}
-    all_confidence = {}
+    version = batch.updated_at or batch.created_at
+    etag = f'"{export_key(batch.id, version, format)}"'
+    filename = f"batch_{batch.id}.{format}"
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": f'attachment; filename="{filename}"'
+    }
     
-    for image in batch.images:
-        if image.ocr_result:
-            data = json.loads(image.ocr_result.data_json) if image.ocr_result.data_json else {}
-            confidence = json.loads(image.ocr_result.confidence_json) if image.ocr_result.confidence_json else {}
-            all_data.update(data)
-            all_confidence.update(confidence)
-    
-    # Create export directory
-    export_date_dir = EXPORT_DIR / datetime.now().strftime("%Y-%m-%d")
-    export_date_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Generate export content
-    if format == "csv":
-        content = export_single_to_csv(all_data, batch.form_type)
-        filename = f"batch_{batch.id}.csv"
-        media_type = "text/csv"
-    else:  # markdown
-        content = export_to_markdown(all_data, batch.form_type, all_confidence)
-        filename = f"batch_{batch.id}.md"
-        media_type = "text/markdown"
-    
-    # Save to server directory
-    export_path = export_date_dir / filename
-    with open(export_path, "w", encoding="utf-8") as f:
-        f.write(content)
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    
+    def render() -> str:
+        # Collect all OCR data
+        all_data = {}
+        all_confidence = {}
+        
+        for image in batch.images:
+            if image.ocr_result:
+                data = json.loads(image.ocr_result.data_json) if image.ocr_result.data_json else {}
+                confidence = json.loads(image.ocr_result.confidence_json) if image.ocr_result.confidence_json else {}
+                all_data.update(data)
+                all_confidence.update(confidence)
+        
+        # Generate export content
+        if format == "csv":
+            return export_single_to_csv(all_data, batch.form_type)
+        return export_to_markdown(all_data, batch.form_type, all_confidence)
+    
+    export_path = get_export(batch.id, version, format, render)
+    media_type = "text/csv" if format == "csv" else "text/markdown"
     
     # Return as download
-    return Response(
-        content=content.encode("utf-8"),
-        media_type=media_type,
-        headers={
-            "Content-Disposition": f'attachment; filename="{filename}"'
-        }
-    )
+    return FileResponse(export_path, media_type=media_type, headers=headers)
 
 def _build_batch_response(batch: Batch, db: Session) -> BatchResponse:
     """Build batch response with OCR results"""
@@ -198,13 +310,26 @@ def _build_batch_response(batch: Batch, db: Session) -> BatchResponse:
         image_data = ImageResponse(
             id=image.id,
             page_index=image.page_index,
-            file_path=image.file_path
+            file_path=image.file_path,
+            attempts=image.attempts or 0,
+            error_message=image.error_message
         )
         
+        if image.quality_status:
+            image_data.quality = {
+                "status": image.quality_status,
+                "notes": image.quality_notes.split("; ") if image.quality_notes else [],
+                "sharpness": image.sharpness,
+                "ink_coverage": image.ink_coverage,
+                "brightness": image.brightness,
+                "skew_angle": image.skew_angle,
+            }
+        
         if image.ocr_result:
             image_data.ocr_data = json.loads(image.ocr_result.data_json) if image.ocr_result.data_json else {}
             image_data.confidence = json.loads(image.ocr_result.confidence_json) if image.ocr_result.confidence_json else {}
             image_data.raw_text = image.ocr_result.raw_text
+            image_data.field_tiers = json.loads(image.ocr_result.field_tiers_json) if image.ocr_result.field_tiers_json else None
         
         images_data.append(image_data)
     
@@ -0,0 +1,72 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from datetime import date
+
+from database import SessionLocal
+from ocr.templates import FORM_TEMPLATES
+from exporters.batch_rows import iter_batch_rows
+from exporters.csv_exporter import stream_csv
+from exporters.parquet_exporter import stream_parquet
+
+router = APIRouter(prefix="/api/exports", tags=["exports"])
+
+@router.get("/csv")
+def export_csv_range(
+    form_type: str = Query(...),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None)
+):
+    """
+    Export every finished batch of a form type (optionally within a date range)
+    as one CSV, streamed row by row
+    """
+    if form_type not in FORM_TEMPLATES:
+        raise HTTPException(status_code=400, detail=f"Unknown form type: {form_type}")
+
+    def generate():
+        # The request's session is closed before streaming starts, so use our own
+        db = SessionLocal()
+        try:
+            rows = (
+                dict(row["data"], batch_id=row["batch_id"], created_at=row["created_at"].isoformat())
+                for row in iter_batch_rows(db, form_type, date_from, date_to)
+            )
+            yield from stream_csv(rows, form_type, leading_columns=["batch_id", "created_at"])
+        finally:
+            db.close()
+
+    filename = f"{form_type}_{date_from or 'all'}_{date_to or 'all'}.csv"
+    return StreamingResponse(
+        generate(),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.get("/parquet")
+def export_parquet_range(
+    form_type: str = Query(...),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None)
+):
+    """
+    Same selection as /csv as a Parquet file: one column per template field,
+    a <field>_confidence column per field and batch metadata, streamed one
+    row group at a time
+    """
+    if form_type not in FORM_TEMPLATES:
+        raise HTTPException(status_code=400, detail=f"Unknown form type: {form_type}")
+
+    def generate():
+        db = SessionLocal()
+        try:
+            yield from stream_parquet(iter_batch_rows(db, form_type, date_from, date_to), form_type)
+        finally:
+            db.close()
+
+    filename = f"{form_type}_{date_from or 'all'}_{date_to or 'all'}.parquet"
+    return StreamingResponse(
+        generate(),
+        media_type="application/vnd.apache.parquet",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
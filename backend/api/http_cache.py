@@ -0,0 +1,18 @@
+from fastapi import Request
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Whether the request's If-None-Match header matches etag: a comma-separated
+    list of tags, compared weakly (W/ prefixes ignored), or "*"
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == "*" or tag == etag:
+            return True
+    return False
@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response
+from sqlalchemy.orm import Session
+from pathlib import Path
+
+from database import get_db
+from models import Image
+from previews import get_preview, preview_key, PREVIEW_FORMATS
+from api.http_cache import etag_matches
+
+router = APIRouter(prefix="/api/images", tags=["images"])
+
+# Previews are keyed by content hash, so they never change for a given URL
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+@router.get("/{image_id}/preview")
+async def get_image_preview(
+    image_id: str,
+    request: Request,
+    size: str = Query("medium", regex="^(thumb|medium|large)$"),
+    format: str = Query("webp", regex="^(webp|jpeg)$"),
+    db: Session = Depends(get_db)
+):
+    """
+    Resized page preview (WebP or JPEG) for the review UI
+    """
+    image = db.query(Image).filter(Image.id == image_id).first()
+    if not image:
+        raise HTTPException(status_code=404, detail="Image not found")
+    if not Path(image.file_path).exists():
+        raise HTTPException(status_code=404, detail="Image file not found")
+    
+    source_key = image.content_hash or image.id
+    etag = f'"{preview_key(source_key, size, format)}"'
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    
+    preview_path = await run_in_threadpool(get_preview, image.file_path, source_key, size, format)
+    return FileResponse(preview_path, media_type=PREVIEW_FORMATS[format][1], headers=headers)
@@ -0,0 +1,39 @@
+from fastapi import APIRouter, HTTPException, Query, Header
+from fastapi.responses import FileResponse
+from typing import Optional
+
+from profiling import PROFILE_HEADER, list_profiles, artifact_path, profiling_active, profiling_requested
+
+router = APIRouter(prefix="/api/profiles", tags=["profiles"])
+
+MEDIA_TYPES = {"folded": "text/plain", "txt": "text/plain", "json": "application/json"}
+
+def _check_access(token: Optional[str]):
+    """Profiles are served only with the same X-Profile header (PROFILING_TOKEN) that records them"""
+    if not profiling_active():
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not profiling_requested(token):
+        raise HTTPException(status_code=403, detail=f"Missing or invalid {PROFILE_HEADER} header")
+
+@router.get("")
+def get_profiles(
+    kind: Optional[str] = Query(None, regex="^(request|job)$"),
+    token: Optional[str] = Header(None, alias=PROFILE_HEADER)
+):
+    """
+    List stored profiles (newest first); each can be downloaded as
+    .folded (collapsed stacks), .txt (hot functions) or .json (metadata)
+    """
+    _check_access(token)
+    return {"profiles": list_profiles(kind)}
+
+@router.get("/{name}.{fmt}")
+def get_profile_artifact(name: str, fmt: str, token: Optional[str] = Header(None, alias=PROFILE_HEADER)):
+    """
+    Download one profile artifact
+    """
+    _check_access(token)
+    path = artifact_path(name, fmt)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type=MEDIA_TYPES[fmt], filename=path.name)
@@ -0,0 +1,50 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+from datetime import date
+from rq.job import Job
+from rq.exceptions import NoSuchJobError
+
+from ocr.templates import FORM_TEMPLATES
+from queues import redis_conn, bulk_queue
+from workers.reextract import run_reextract_job
+
+router = APIRouter(prefix="/api/reextract", tags=["reextract"])
+
+@router.post("", status_code=202)
+def start_reextract(
+    form_type: Optional[str] = Query(None),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None)
+):
+    """
+    Enqueue a bulk re-extraction of stored OCR results
+    """
+    if form_type and form_type not in FORM_TEMPLATES:
+        raise HTTPException(status_code=400, detail=f"Unknown form type: {form_type}")
+    
+    job = bulk_queue.enqueue(
+        run_reextract_job,
+        form_type=form_type,
+        date_from=date_from,
+        date_to=date_to,
+        job_timeout='2h'
+    )
+    return {"job_id": job.id, "status": job.get_status()}
+
+@router.get("/{job_id}")
+def get_reextract(job_id: str):
+    """
+    Get re-extraction job status and progress (processed rows, rows/sec)
+    """
+    try:
+        job = Job.fetch(job_id, connection=redis_conn)
+    except NoSuchJobError:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return {
+        "job_id": job.id,
+        "status": job.get_status(),
+        "progress": job.meta.get("progress"),
+        "result": job.result,
+        "error": job.exc_info
+    }
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Headless Batch OCR
+Run OCR over a directory (or glob) of scans without the API, Redis or the database
+
+Each worker process loads the OCR engine once and then processes files from
+the shared list. Results are streamed to CSV (template field order, as in the
+batch export) or JSONL as they complete. Finished files are appended to a
+manifest next to the output, so re-running the same command after an
+interruption only processes the remaining files.
+
+Usage:
+    python batch_ocr.py ../scans --out results.csv [--form-type GCCF_10K_P1]
+    python batch_ocr.py "../scans/**/*.jpg" --out results.jsonl --processes 4
+
+With --form-type AUTO and CSV output, one CSV per detected form type is
+written (results_GCCF_10K_P1.csv, ...).
+"""
+import argparse
+import csv
+import glob
+import json
+import logging
+import os
+import tempfile
+import time
+from multiprocessing import Pool
+from pathlib import Path
+
+from exporters.csv_exporter import get_csv_headers
+from workers.document_ingest import DOCUMENT_EXTENSIONS, iter_pages
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("batch_ocr")
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+_processor = None
+
+
+def collect_inputs(pattern: str):
+    """Files under a directory (recursively) or matching a glob, in a stable order"""
+    extensions = IMAGE_EXTENSIONS | set(DOCUMENT_EXTENSIONS)
+    if os.path.isdir(pattern):
+        paths = (str(p) for p in Path(pattern).rglob("*"))
+    else:
+        paths = glob.glob(pattern, recursive=True)
+    return sorted(p for p in paths if Path(p).suffix.lower() in extensions and os.path.isfile(p))
+
+
+def _init_worker():
+    """Load the OCR engine once per worker process"""
+    global _processor
+    from ocr.engine import get_processor
+    _processor = get_processor()
+
+
+def _process_file(task):
+    """
+    OCR every page of one input file.
+    Returns (path, [page records], error message or None).
+    """
+    path, form_type = task
+    try:
+        if Path(path).suffix.lower() in DOCUMENT_EXTENSIONS:
+            records = []
+            with tempfile.TemporaryDirectory(prefix="batch_ocr_") as tmp_dir:
+                for page_index, page in enumerate(iter_pages(path)):
+                    page_path = os.path.join(tmp_dir, f"page_{page_index}.jpg")
+                    page.save(page_path, format="JPEG", quality=92)
+                    page.close()
+                    records.append(_record(path, page_index, _processor.process_document(page_path, form_type)))
+                    os.remove(page_path)
+            return path, records, None
+        return path, [_record(path, 0, _processor.process_document(path, form_type))], None
+    except Exception as exc:
+        return path, [], f"{type(exc).__name__}: {exc}"
+
+
+def _record(path, page_index, result):
+    return {
+        "source": path,
+        "page": page_index,
+        "form_type": result.get("form_type"),
+        "method": result.get("method"),
+        "data": result.get("data", {}),
+        "confidence": result.get("confidence", {}),
+    }
+
+
+class ResultWriter:
+    """Appends page records to CSV (one file per form type) or JSONL"""
+
+    def __init__(self, out_path: str, fmt: str, split_by_form_type: bool = False):
+        self.out_path = Path(out_path)
+        self.fmt = fmt
+        self.split_by_form_type = split_by_form_type
+        self._files = {}
+        self._writers = {}
+
+    def write(self, record):
+        if self.fmt == "jsonl":
+            handle = self._open(self.out_path)
+            handle.write(json.dumps(record, ensure_ascii=False) + "\n")
+            return
+
+        form_type = record["form_type"]
+        writer = self._writers.get(form_type)
+        if writer is None:
+            writer = self._csv_writer(form_type)
+        headers = writer.fieldnames
+        row = {"source": record["source"], "page": record["page"]}
+        for key in headers[2:]:
+            value = record["data"].get(key)
+            # Table fields hold lists of row dicts
+            row[key] = value if isinstance(value, str) or value is None else json.dumps(value, ensure_ascii=False)
+        writer.writerow(row)
+
+    def flush(self):
+        for handle in self._files.values():
+            handle.flush()
+
+    def close(self):
+        for handle in self._files.values():
+            handle.close()
+
+    def _csv_writer(self, form_type):
+        if self.split_by_form_type:
+            path = self.out_path.with_name(f"{self.out_path.stem}_{form_type}{self.out_path.suffix}")
+        else:
+            path = self.out_path
+        is_new = not path.exists() or path.stat().st_size == 0
+        handle = self._open(path)
+        headers, header_labels = get_csv_headers(form_type)
+        writer = csv.DictWriter(handle, fieldnames=["source", "page"] + headers)
+        if is_new:
+            # Header with Chinese labels, like the batch export
+            writer.writerow(dict(zip(writer.fieldnames, ["source", "page"] + header_labels)))
+        self._writers[form_type] = writer
+        return writer
+
+    def _open(self, path):
+        handle = self._files.get(path)
+        if handle is None:
+            handle = open(path, "a", encoding="utf-8", newline="")
+            self._files[path] = handle
+        return handle
+
+
+def load_manifest(manifest_path: Path):
+    if not manifest_path.exists():
+        return set()
+    with open(manifest_path, encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run OCR over a directory or glob of scans")
+    parser.add_argument("inputs", help="Directory (searched recursively) or glob pattern")
+    parser.add_argument("--out", required=True, help="Output file (.csv or .jsonl)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default=None,
+                        help="Output format (default: from the --out extension)")
+    parser.add_argument("--form-type", default="AUTO")
+    parser.add_argument("--processes", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="Worker processes, each with its own OCR engine")
+    parser.add_argument("--manifest", default=None,
+                        help="Resume manifest (default: <out>.manifest)")
+    args = parser.parse_args()
+
+    fmt = args.format or ("jsonl" if args.out.endswith(".jsonl") else "csv")
+    manifest_path = Path(args.manifest or f"{args.out}.manifest")
+
+    inputs = collect_inputs(args.inputs)
+    done = load_manifest(manifest_path)
+    todo = [path for path in inputs if path not in done]
+    logger.info("%d files found, %d already done, %d to process with %d processes",
+                len(inputs), len(inputs) - len(todo), len(todo), args.processes)
+
+    writer = ResultWriter(args.out, fmt, split_by_form_type=args.form_type == "AUTO")
+    started = time.monotonic()
+    pages = files = errors = 0
+
+    with open(manifest_path, "a", encoding="utf-8") as manifest, \
+            Pool(args.processes, initializer=_init_worker) as pool:
+        tasks = ((path, args.form_type) for path in todo)
+        for path, records, error in pool.imap_unordered(_process_file, tasks):
+            if error:
+                errors += 1
+                logger.error("Failed %s: %s", path, error)
+                continue
+            for record in records:
+                writer.write(record)
+            # Results are on disk before the file is marked done
+            writer.flush()
+            manifest.write(path + "\n")
+            manifest.flush()
+
+            files += 1
+            pages += len(records)
+            elapsed = time.monotonic() - started
+            if files % 10 == 0 or files == len(todo):
+                logger.info("%d/%d files, %d pages, %.2f pages/sec",
+                            files, len(todo), pages, pages / elapsed if elapsed else 0.0)
+
+    writer.close()
+    elapsed = time.monotonic() - started
+    print(f"✅ {pages} pages from {files} files in {elapsed:.1f}s "
+          f"({pages / elapsed if elapsed else 0.0:.2f} pages/sec), {errors} failed")
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+OCR Throughput Benchmark
+Compare pages/sec of the per-page path (extract_text_paddle) with cross-page
+batched recognition (extract_text_paddle_batch), and report pages whose text
+differs between the two (OCR_BATCH_PAGES should stay 1 until none do)
+
+Usage:
+    python bench_ocr.py "../Sample/**/*.jp*g" [--group 8] [--rec-batch 32] [--repeat 3]
+"""
+import argparse
+import glob
+import time
+
+import config
+
+
+def _run(label, fn, pages, repeat):
+    # Warm-up so model loading and first-call allocations are not measured
+    fn(pages[:1])
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(pages)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<12} {len(pages)} pages in {best:.2f}s  ->  {len(pages) / best:.2f} pages/sec")
+    return len(pages) / best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-page vs batched OCR")
+    parser.add_argument("pattern", help="Glob of page images")
+    parser.add_argument("--group", type=int, default=max(config.OCR_BATCH_PAGES, 8), help="Pages per batched group")
+    parser.add_argument("--rec-batch", type=int, default=config.OCR_REC_BATCH_SIZE, help="Recognizer batch size")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pages = sorted(glob.glob(args.pattern, recursive=True))
+    if not pages:
+        raise SystemExit(f"No images match {args.pattern}")
+
+    # Must be set before ocr.processor reads it
+    config.OCR_REC_BATCH_SIZE = args.rec_batch
+    from ocr.engine import get_processor
+    processor = get_processor()
+
+    texts = {"per-page": {}, "batched": {}}
+
+    def per_page(paths):
+        for path in paths:
+            texts["per-page"][path] = processor.extract_text_paddle(path)[0]
+
+    def batched(paths):
+        for start in range(0, len(paths), args.group):
+            group = paths[start:start + args.group]
+            outputs = processor.extract_text_paddle_batch(group)
+            errors = [o for o in outputs if isinstance(o, Exception)]
+            if errors:
+                raise errors[0]
+            if any(o is None for o in outputs):
+                raise RuntimeError("batched recognition failed and fell back to the per-page path")
+            texts["batched"].update((path, o[0]) for path, o in zip(group, outputs))
+
+    baseline = _run("per-page", per_page, pages, args.repeat)
+    pooled = _run(f"batched x{args.group}", batched, pages, args.repeat)
+    print(f"speed-up     {pooled / baseline:.2f}x (rec batch {args.rec_batch})")
+
+    differing = [path for path in pages if texts["per-page"][path] != texts["batched"][path]]
+    print(f"output       {len(pages) - len(differing)}/{len(pages)} pages identical")
+    for path in differing:
+        print(f"  differs: {path}")
@@ -8,10 +8,22 @@ load_dotenv()
 BASE_DIR = Path(__file__).resolve().parent
 UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "./uploads"))
 EXPORT_DIR = Path(os.getenv("EXPORT_DIR", "./data/exports"))
+# Content-addressable upload store; keep on the same filesystem as UPLOAD_DIR for hardlinks
+OBJECT_STORE_DIR = Path(os.getenv("OBJECT_STORE_DIR", "./data/objects"))
+PREVIEW_DIR = Path(os.getenv("PREVIEW_DIR", "./data/previews"))
+REGISTRATION_CACHE_DIR = Path(os.getenv("REGISTRATION_CACHE_DIR", "./data/registration"))
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "./data/profiles"))
+# Per-day zip archives of original uploads (see lifecycle.py); can live on cheaper storage
+LIFECYCLE_ARCHIVE_DIR = Path(os.getenv("LIFECYCLE_ARCHIVE_DIR", "./data/archive"))
 
 # Create directories if they don't exist
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+OBJECT_STORE_DIR.mkdir(parents=True, exist_ok=True)
+PREVIEW_DIR.mkdir(parents=True, exist_ok=True)
+REGISTRATION_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+LIFECYCLE_ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
 
 # Database
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./ocr_app.db")
@@ -23,5 +35,93 @@ REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 USE_GPT_VISION = os.getenv("USE_GPT_VISION", "false").lower() == "true"
 
+# Form templates: JSON files compiled at startup and reloaded when they change
+TEMPLATE_DIR = Path(os.getenv("TEMPLATE_DIR", str(BASE_DIR / "ocr" / "forms")))
+TEMPLATE_RELOAD_SECONDS = float(os.getenv("TEMPLATE_RELOAD_SECONDS", "2"))  # 0 disables reloading
+
 # OCR Settings
 OCR_LANGUAGE = os.getenv("OCR_LANGUAGE", "ch")  # Chinese
+RASTER_DPI = int(os.getenv("RASTER_DPI", "200"))  # Resolution for rasterizing PDF/TIFF pages
+# Pages per OCR group in process_batch and the OCR server; >1 pools text recognition across pages
+# (opt-in: detection is unchanged, but recognizer batches mix pages, so check bench_ocr.py)
+OCR_BATCH_PAGES = int(os.getenv("OCR_BATCH_PAGES", "1"))
+# Max pages waiting between pipeline stages (decode -> OCR -> persist); bounds decoded images in memory
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "8"))
+# Re-runs of a batch (e.g. after a worker crash) skip pages that already failed this many
+# times; POST /api/batches/{id}/retry ignores the limit
+IMAGE_MAX_ATTEMPTS = int(os.getenv("IMAGE_MAX_ATTEMPTS", "3"))
+# A processing batch that persisted no page for this long is treated as dead (worker OOM-killed,
+# SIGKILLed or redeployed): it is marked as error so it can be retried and leaves the backlog
+BATCH_STALE_MINUTES = float(os.getenv("BATCH_STALE_MINUTES", "15"))
+OCR_REC_BATCH_SIZE = int(os.getenv("OCR_REC_BATCH_SIZE", "32"))  # Text crops per recognizer forward pass
+# full: PPStructure layout + whole-page OCR; roi: read only template field regions when the form type is known
+# cascade: cheapest local tier first, escalating low-confidence fields to heavier tiers and GPT Vision
+OCR_EXTRACTION_MODE = os.getenv("OCR_EXTRACTION_MODE", "full").lower()
+# Default per-field confidence below which the cascade escalates (templates may override)
+CASCADE_CONFIDENCE_THRESHOLD = float(os.getenv("CASCADE_CONFIDENCE_THRESHOLD", "0.6"))
+# Warp pages onto the template reference image before ROI extraction
+TEMPLATE_REGISTRATION = os.getenv("TEMPLATE_REGISTRATION", "true").lower() == "true"
+REGISTRATION_MAX_EDGE = int(os.getenv("REGISTRATION_MAX_EDGE", "1000"))  # Long edge used for keypoint matching
+
+# Per-job memory ceiling for OCR workers (process RSS); 0 disables. Pages are downscaled
+# to fit the remaining headroom, down to MEMORY_MIN_PAGE_EDGE pixels on the long edge
+JOB_MEMORY_LIMIT_MB = float(os.getenv("JOB_MEMORY_LIMIT_MB", "0"))
+MEMORY_MIN_PAGE_EDGE = int(os.getenv("MEMORY_MIN_PAGE_EDGE", "1600"))
+MEMORY_TRACEMALLOC = os.getenv("MEMORY_TRACEMALLOC", "false").lower() == "true"  # Top allocation sites per job (slow)
+
+# On-demand profiling: requests whose X-Profile header equals PROFILING_TOKEN, and the OCR jobs
+# they enqueue, are sampled and written to PROFILE_DIR (stays off while the token is empty)
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILE_SAMPLE_MS = float(os.getenv("PROFILE_SAMPLE_MS", "5"))  # Stack sampling interval
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "200"))  # Newest profiles kept on disk
+
+# OCR backend: local loads the models in each process; server sends pages to ocr_server.py
+OCR_BACKEND = os.getenv("OCR_BACKEND", "local").lower()
+OCR_SERVER_URL = os.getenv("OCR_SERVER_URL", "http://127.0.0.1:8866")  # or unix:///path/to/ocr.sock
+OCR_SERVER_TIMEOUT = float(os.getenv("OCR_SERVER_TIMEOUT", "300"))  # Seconds per client request
+# Micro-batching on the server: wait up to MAX_WAIT_MS for more pages, run at most MAX_BATCH together
+OCR_SERVER_MAX_BATCH = int(os.getenv("OCR_SERVER_MAX_BATCH", "16"))
+OCR_SERVER_MAX_WAIT_MS = float(os.getenv("OCR_SERVER_MAX_WAIT_MS", "25"))
+
+# Pre-OCR quality triage
+QUALITY_TRIAGE = os.getenv("QUALITY_TRIAGE", "true").lower() == "true"
+QUALITY_MIN_SHARPNESS = float(os.getenv("QUALITY_MIN_SHARPNESS", "15"))  # Laplacian variance; reject below
+QUALITY_FLAG_SHARPNESS = float(os.getenv("QUALITY_FLAG_SHARPNESS", "60"))  # flag below
+QUALITY_MIN_INK = float(os.getenv("QUALITY_MIN_INK", "0.002"))  # Dark pixel fraction; reject blank pages below
+QUALITY_MIN_BRIGHTNESS = float(os.getenv("QUALITY_MIN_BRIGHTNESS", "40"))  # Paper level (90th pct); flag below
+QUALITY_MIN_CONTRAST = float(os.getenv("QUALITY_MIN_CONTRAST", "40"))  # Paper minus typical ink level; flag below
+# Fraction of pixels clipped to black (or white); reject at or above as under/overexposed when contrast is also low
+QUALITY_MAX_CLIPPED = float(os.getenv("QUALITY_MAX_CLIPPED", "0.99"))
+QUALITY_MAX_SKEW = float(os.getenv("QUALITY_MAX_SKEW", "15"))  # Degrees; larger skews are flagged, not corrected
+
+# Bulk re-extraction
+REEXTRACT_CHUNK_SIZE = int(os.getenv("REEXTRACT_CHUNK_SIZE", "500"))
+REEXTRACT_PROCESSES = int(os.getenv("REEXTRACT_PROCESSES", str(os.cpu_count() or 1)))
+
+# Storage lifecycle (lifecycle.py); a value of 0 days disables that pass
+LIFECYCLE_ARCHIVE_DAYS = int(os.getenv("LIFECYCLE_ARCHIVE_DAYS", "90"))  # Archive originals of finished batches
+LIFECYCLE_EXPORT_DAYS = int(os.getenv("LIFECYCLE_EXPORT_DAYS", "30"))  # Prune exports unused this long
+LIFECYCLE_COMPRESS_DAYS = int(os.getenv("LIFECYCLE_COMPRESS_DAYS", "30"))  # Compress stored OCR text
+LIFECYCLE_CHUNK_SIZE = int(os.getenv("LIFECYCLE_CHUNK_SIZE", "200"))  # Batches / result rows per chunk
+LIFECYCLE_DISPLAY_MAX_EDGE = int(os.getenv("LIFECYCLE_DISPLAY_MAX_EDGE", "2000"))  # Re-encoded display copies
+LIFECYCLE_DISPLAY_QUALITY = int(os.getenv("LIFECYCLE_DISPLAY_QUALITY", "80"))
+LIFECYCLE_INTERVAL_HOURS = float(os.getenv("LIFECYCLE_INTERVAL_HOURS", "24"))  # lifecycle.py --loop
+
+# Priority lanes
+# Seconds create_batch waits for an interactive job before returning the pending batch
+INTERACTIVE_WAIT_SECONDS = float(os.getenv("INTERACTIVE_WAIT_SECONDS", "20"))
+INTERACTIVE_JOB_TIMEOUT = os.getenv("INTERACTIVE_JOB_TIMEOUT", "2m")
+BULK_JOB_TIMEOUT = os.getenv("BULK_JOB_TIMEOUT", "10m")
+
+# Admission control for bulk uploads
+# Reject new batches (429) when the queued backlog would take longer than this to drain; 0 disables
+ADMISSION_MAX_BACKLOG_SECONDS = float(os.getenv("ADMISSION_MAX_BACKLOG_SECONDS", "1800"))
+# Window of OCR'd pages (and their worker time) used for the throughput estimate
+ADMISSION_WINDOW_MINUTES = float(os.getenv("ADMISSION_WINDOW_MINUTES", "15"))
+
+# Image previews
+PREVIEW_CACHE_MAX_BYTES = int(os.getenv("PREVIEW_CACHE_MAX_MB", "1024")) * 1024 * 1024
+
+# Batch exports (cached under EXPORT_DIR, least-recently-used files evicted past the limit)
+EXPORT_CACHE_MAX_BYTES = int(os.getenv("EXPORT_CACHE_MAX_MB", "512")) * 1024 * 1024
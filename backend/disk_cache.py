@@ -0,0 +1,78 @@
+"""
+Size-bounded on-disk caches with least-recently-used eviction.
+
+Used by the preview and export caches. Recency is the file mtime, refreshed by
+touch() on every hit. The cache size is tracked approximately in memory (one
+directory scan on first use); once it passes max_bytes the least recently used
+files are evicted down to 90% of the limit, so the directory isn't rescanned
+on every write.
+"""
+import logging
+import os
+import stat
+import threading
+from pathlib import Path
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Evict down to this fraction of the limit
+EVICT_TO = 0.9
+
+
+class LRUDiskCache:
+    """LRU size accounting and eviction for every file under directory"""
+
+    def __init__(self, directory: Path, max_bytes: int, label: str):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.label = label  # For log messages ("previews", "exports")
+        self._lock = threading.Lock()
+        self._bytes = None  # Approximate size, initialised by the first account()
+
+    def touch(self, path: Path) -> bool:
+        """
+        Mark a cached file as recently used. False if it is gone (evicted or
+        pruned since it was looked up), which callers treat as a miss.
+        """
+        try:
+            os.utime(path, None)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def account(self, added_bytes: int):
+        """Record bytes written (negative when freed) and evict past the limit"""
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = sum(size for _, _, size in self._scan())
+            else:
+                self._bytes += added_bytes
+
+            if self._bytes <= self.max_bytes:
+                return
+
+            files = sorted(self._scan())
+            total = sum(size for _, _, size in files)
+            limit = int(self.max_bytes * EVICT_TO)
+            removed = 0
+            for _, path, size in files:
+                if total <= limit:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+                removed += 1
+            self._bytes = total
+            logger.info("Evicted %d %s (%s now %d bytes)", removed, self.label, self.directory, total)
+
+    def _scan(self) -> List[Tuple[float, Path, int]]:
+        """(mtime, path, size) of every file, skipping files removed during the scan"""
+        files = []
+        for path in self.directory.rglob("*"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            if stat.S_ISREG(st.st_mode):
+                files.append((st.st_mtime, path, st.st_size))
+        return files
@@ -0,0 +1,70 @@
+"""
+Cached batch export artifacts.
+
+Exports are keyed by batch id, Batch.updated_at and format, so an unchanged
+batch is served from disk instead of being rebuilt; any edit bumps
+updated_at and produces a new key. Older versions of a batch's exports are
+removed when a new one is written, and EXPORT_DIR as a whole is kept under
+EXPORT_CACHE_MAX_BYTES by evicting the least recently used files.
+"""
+import os
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+from config import EXPORT_DIR, EXPORT_CACHE_MAX_BYTES
+from disk_cache import LRUDiskCache
+
+EXPORT_CACHE_DIR = EXPORT_DIR / "cache"
+
+# Covers all of EXPORT_DIR, including dated export folders written before exports were cached
+_cache = LRUDiskCache(EXPORT_DIR, EXPORT_CACHE_MAX_BYTES, "exports")
+
+
+def export_key(batch_id: str, updated_at: datetime, fmt: str) -> str:
+    """Cache key (and ETag value) of one export version"""
+    return f"batch_{batch_id}_{updated_at.strftime('%Y%m%d%H%M%S%f')}.{fmt}"
+
+
+def get_export(batch_id: str, updated_at: datetime, fmt: str, render: Callable[[], str]) -> Path:
+    """
+    Return the cached export for this batch version, calling render() to
+    build its text content on a miss.
+    """
+    target = EXPORT_CACHE_DIR / export_key(batch_id, updated_at, fmt)
+    # Refresh mtime so eviction treats it as recently used; gone since the check means a miss
+    if target.exists() and _cache.touch(target):
+        return target
+
+    content = render()
+    EXPORT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=EXPORT_CACHE_DIR)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as tmp:
+            tmp.write(content)
+        os.replace(tmp_name, target)
+    finally:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+
+    # Superseded versions of this export can never be served again
+    freed = 0
+    for stale in EXPORT_CACHE_DIR.glob(f"batch_{batch_id}_*.{fmt}"):
+        if stale == target:
+            continue
+        try:
+            freed += stale.stat().st_size
+            stale.unlink()
+        except FileNotFoundError:
+            pass  # Removed concurrently
+
+    _cache.account(target.stat().st_size - freed)
+    return target
+
+
+def invalidate(batch_id: str):
+    """Drop all cached exports of a batch (e.g. after user edits)"""
+    for path in EXPORT_CACHE_DIR.glob(f"batch_{batch_id}_*"):
+        path.unlink(missing_ok=True)
+
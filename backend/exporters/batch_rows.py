@@ -0,0 +1,61 @@
+"""
+Streaming source of per-batch export rows across many batches.
+
+Results are read through a server-side cursor (Query.yield_per) in batch and
+page order, and the pages of each batch are merged into one row the same way
+export_batch does, so memory stays constant regardless of the export size.
+"""
+import json
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, Optional
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from models import Batch, BatchStatus, Image, OcrResult
+
+# Rows fetched per round trip from the server-side cursor
+FETCH_SIZE = 1000
+
+
+def iter_batch_rows(
+    db: Session,
+    form_type: str,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    fetch_size: int = FETCH_SIZE
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield {"batch_id", "created_at", "data", "confidence"} per finished batch.
+    Only pages extracted with form_type (or legacy pages of a batch uploaded
+    as form_type) are included; date_from/date_to (inclusive) filter on the
+    batch creation date.
+    """
+    query = (
+        db.query(Batch.id, Batch.created_at, OcrResult.data_json, OcrResult.confidence_json)
+        .join(Image, Image.batch_id == Batch.id)
+        .join(OcrResult, OcrResult.image_id == Image.id)
+        .filter(
+            Batch.status == BatchStatus.DONE,
+            or_(
+                OcrResult.form_type == form_type,
+                and_(OcrResult.form_type.is_(None), Batch.form_type == form_type)
+            )
+        )
+    )
+    if date_from:
+        query = query.filter(Batch.created_at >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        query = query.filter(Batch.created_at < datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+    query = query.order_by(Batch.created_at, Batch.id, Image.page_index).yield_per(fetch_size)
+
+    current = None
+    for batch_id, created_at, data_json, confidence_json in query:
+        if current is None or current["batch_id"] != batch_id:
+            if current is not None:
+                yield current
+            current = {"batch_id": batch_id, "created_at": created_at, "data": {}, "confidence": {}}
+        current["data"].update(json.loads(data_json) if data_json else {})
+        current["confidence"].update(json.loads(confidence_json) if confidence_json else {})
+    if current is not None:
+        yield current
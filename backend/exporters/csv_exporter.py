@@ -1,19 +1,21 @@
 import csv
 import io
-from typing import List, Dict, Any
-from ocr.templates import get_template, get_field_labels
+import json
+from typing import List, Dict, Any, Tuple, Iterable, Iterator
+from ocr.templates import get_template
+
+def get_csv_headers(form_type: str) -> Tuple[List[str], List[str]]:
+    """Column keys and their (Chinese) header labels in template field order"""
+    template = get_template(form_type)
+    return list(template.field_keys), list(template.header_labels)
 
 def export_to_csv(batches_data: List[Dict[str, Any]], form_type: str) -> str:
     """
     Export batch results to CSV format
     Each row represents one form/batch
     """
-    template = get_template(form_type)
-    field_labels = get_field_labels(form_type)
-    
     # Prepare CSV headers
-    headers = [field["key"] for field in template["fields"]]
-    header_labels = [field["label"] for field in template["fields"]]
+    headers, header_labels = get_csv_headers(form_type)
     
     # Create CSV in memory
     output = io.StringIO()
@@ -34,3 +36,38 @@ def export_to_csv(batches_data: List[Dict[str, Any]], form_type: str) -> str:
 def export_single_to_csv(data: Dict[str, Any], form_type: str) -> str:
     """Export single batch to CSV"""
     return export_to_csv([data], form_type)
+
+def stream_csv(
+    rows: Iterable[Dict[str, Any]],
+    form_type: str,
+    leading_columns: List[str] = (),
+    chunk_rows: int = 500
+) -> Iterator[str]:
+    """
+    Yield CSV text in chunks of chunk_rows rows, so exports of any size are
+    written with constant memory. leading_columns (e.g. batch_id) come
+    before the template fields and use their key as header label.
+    """
+    headers, header_labels = get_csv_headers(form_type)
+    fieldnames = list(leading_columns) + headers
+    
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=fieldnames, extrasaction="ignore")
+    writer.writerow(dict(zip(fieldnames, list(leading_columns) + header_labels)))
+    
+    pending = 0
+    for data in rows:
+        writer.writerow({key: _csv_value(data.get(key, "")) for key in fieldnames})
+        pending += 1
+        if pending >= chunk_rows:
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate()
+            pending = 0
+    yield output.getvalue()
+
+def _csv_value(value):
+    # Table fields hold lists of row dicts
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
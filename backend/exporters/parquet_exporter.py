@@ -0,0 +1,112 @@
+"""
+Columnar (Parquet) export for analytics.
+
+One typed column per template field plus a float confidence column per field
+("<key>_confidence") and batch metadata (batch_id, created_at, form_type).
+Rows are written in row groups of row_group_size as they arrive, and the bytes
+produced so far are yielded after each group, so large historical ranges can
+be streamed without building the file in memory.
+"""
+import json
+from typing import Any, Dict, Iterable, Iterator, List
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ocr.templates import get_template
+
+ROW_GROUP_SIZE = 10000
+
+
+def parquet_schema(form_type: str) -> pa.Schema:
+    """Batch metadata, then each template field followed by its confidence"""
+    template = get_template(form_type)
+    fields = [
+        pa.field("batch_id", pa.string()),
+        pa.field("created_at", pa.timestamp("us")),
+        pa.field("form_type", pa.string()),
+    ]
+    for field in template["fields"]:
+        fields.append(pa.field(field["key"], pa.string(), metadata={"label": field["label"]}))
+        fields.append(pa.field(f"{field['key']}_confidence", pa.float64()))
+    return pa.schema(fields)
+
+
+class _ChunkSink:
+    """Write-only file object that collects bytes until they are drained"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_parquet(
+    rows: Iterable[Dict[str, Any]],
+    form_type: str,
+    row_group_size: int = ROW_GROUP_SIZE
+) -> Iterator[bytes]:
+    """
+    Yield the Parquet file for rows as produced by exporters.batch_rows
+    ({"batch_id", "created_at", "data", "confidence"}), one row group at a time.
+    """
+    schema = parquet_schema(form_type)
+    keys = get_template(form_type).field_keys
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+
+    columns = {name: [] for name in schema.names}
+
+    def flush_group():
+        writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+        for values in columns.values():
+            values.clear()
+
+    count = 0
+    for row in rows:
+        data, confidence = row["data"], row["confidence"]
+        columns["batch_id"].append(row["batch_id"])
+        columns["created_at"].append(row["created_at"])
+        columns["form_type"].append(form_type)
+        for key in keys:
+            columns[key].append(_column_value(data.get(key)))
+            score = confidence.get(key)
+            columns[f"{key}_confidence"].append(float(score) if isinstance(score, (int, float)) else None)
+        count += 1
+        if count % row_group_size == 0:
+            flush_group()
+            yield sink.drain()
+
+    if count % row_group_size or not count:
+        flush_group()
+    writer.close()
+    yield sink.drain()
+
+
+def _column_value(value):
+    if value in (None, ""):
+        return None
+    # Table fields hold lists of row dicts
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
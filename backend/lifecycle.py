@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Storage Lifecycle Script
+Archive old originals, prune stale exports and compress old OCR text
+
+Usage:
+    python lifecycle.py [--dry-run]                 # one run (e.g. from cron)
+    python lifecycle.py --loop                      # run every LIFECYCLE_INTERVAL_HOURS
+    python lifecycle.py --vacuum                    # one-off SQLite VACUUM (locks the DB)
+
+Only one run at a time: a lock file in LIFECYCLE_ARCHIVE_DIR makes overlapping
+runs exit immediately.
+"""
+import argparse
+import fcntl
+import logging
+import sys
+import time
+
+from config import LIFECYCLE_ARCHIVE_DIR, LIFECYCLE_INTERVAL_HOURS
+from database import init_db
+from workers.lifecycle import run_lifecycle, vacuum_database
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+
+def _mb(size: int) -> str:
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+def run_once(dry_run: bool):
+    stats = run_lifecycle(dry_run=dry_run)
+    archive, exports, results = stats["archive"], stats["exports"], stats["results"]
+    prefix = "🔎 Would reclaim" if dry_run else "✅ Reclaimed"
+    print(f"📦 Archive: {archive['batches']} batches, {archive['pages']} pages, {archive['documents']} documents "
+          f"({_mb(archive['reclaimed_bytes'])} freed, archive grew {_mb(archive['archive_bytes'])}"
+          f"{', ' + str(archive['failed']) + ' failed' if archive['failed'] else ''})")
+    print(f"🗑️  Exports: {exports['files']} files ({_mb(exports['reclaimed_bytes'])})")
+    print(f"🗜️  Results: {results['rows']} rows compressed ({_mb(results['reclaimed_bytes'])} of text, "
+          f"{_mb(results['db_file_reclaimed_bytes'])} returned by the database file)")
+    print(f"{prefix} {_mb(stats['reclaimed_bytes'])} in {stats['elapsed']}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply the storage retention policy")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be reclaimed without changing anything")
+    parser.add_argument("--loop", action="store_true", help="Keep running every LIFECYCLE_INTERVAL_HOURS")
+    parser.add_argument("--vacuum", action="store_true",
+                        help="Rebuild the SQLite file and enable incremental auto-vacuum (one-off)")
+    args = parser.parse_args()
+
+    init_db()
+    lock_file = open(LIFECYCLE_ARCHIVE_DIR / ".lifecycle.lock", "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        print("⏭️  Another lifecycle run is in progress")
+        sys.exit(0)
+
+    if args.vacuum:
+        print(f"✅ VACUUM released {_mb(vacuum_database())}")
+        sys.exit(0)
+
+    while True:
+        run_once(args.dry_run)
+        if not args.loop:
+            break
+        time.sleep(LIFECYCLE_INTERVAL_HOURS * 3600)
@@ -1,11 +1,17 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import logging
 
 from database import init_db
 from api.batches import router as batches_router
+from api.reextract import router as reextract_router
+from api.images import router as images_router
+from api.exports import router as exports_router
+from api.profiles import router as profiles_router
 from config import UPLOAD_DIR
+from profiling import PROFILE_HEADER, Profile, profiling_active, profiling_requested
 
 # Configure logging
 logging.basicConfig(
@@ -36,6 +42,32 @@ app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
 
 # Include routers
 app.include_router(batches_router)
+app.include_router(reextract_router)
+app.include_router(images_router)
+app.include_router(exports_router)
+app.include_router(profiles_router)
+
+async def profile_request(request: Request, call_next):
+    """Profile requests sent with the X-Profile header"""
+    # Reading profiles (which also needs the header) is not itself profiled
+    if (not profiling_requested(request.headers.get(PROFILE_HEADER))
+            or request.url.path.startswith("/api/profiles")):
+        return await call_next(request)
+    # Streaming response bodies are produced after this returns and are not included
+    handle = Profile("request", f"{request.method} {request.url.path}")
+    handle.start()
+    try:
+        response = await call_next(request)
+    finally:
+        handle.stop()
+        # Writing the artifacts is blocking file I/O; keep it off the event loop
+        await run_in_threadpool(handle.save)
+    response.headers["X-Profile-Id"] = handle.name
+    return response
+
+# Only pay for the middleware when profiling is enabled (with a token)
+if profiling_active():
+    app.middleware("http")(profile_request)
 
 @app.on_event("startup")
 async def startup_event():
@@ -1,10 +1,29 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Enum, Text, Integer
+from sqlalchemy import Column, String, DateTime, ForeignKey, Enum, Text, Integer, Boolean, Float
 from sqlalchemy.orm import relationship
+from sqlalchemy.types import TypeDecorator
 from datetime import datetime
+import base64
 import uuid
 import enum
+import zlib
 from database import Base
 
+# Marks a text value compressed by the storage lifecycle job (workers/lifecycle.py)
+COMPRESSED_PREFIX = "zlib+b64:"
+
+def compress_text(value: str) -> str:
+    return COMPRESSED_PREFIX + base64.b64encode(zlib.compress(value.encode("utf-8"), 9)).decode("ascii")
+
+class CompressibleText(TypeDecorator):
+    """Text column whose old values may be stored compressed; reads are transparent"""
+    impl = Text
+    cache_ok = True
+
+    def process_result_value(self, value, dialect):
+        if value is not None and value.startswith(COMPRESSED_PREFIX):
+            return zlib.decompress(base64.b64decode(value[len(COMPRESSED_PREFIX):])).decode("utf-8")
+        return value
+
 class BatchStatus(str, enum.Enum):
     PENDING = "pending"
     PROCESSING = "processing"
@@ -20,9 +39,12 @@ class Batch(Base):
     status = Column(Enum(BatchStatus), default=BatchStatus.PENDING)
     form_type = Column(String, default="GCCF_10K")  # Form template type
     error_message = Column(Text, nullable=True)
+    archived_at = Column(DateTime, nullable=True)  # Originals moved to the per-day archive
+    job_id = Column(String, nullable=True)  # RQ job of the latest run (None when processed in the API)
     
     # Relationships
-    images = relationship("Image", back_populates="batch", cascade="all, delete-orphan")
+    images = relationship("Image", back_populates="batch", cascade="all, delete-orphan", order_by="Image.page_index")
+    documents = relationship("SourceDocument", back_populates="batch", cascade="all, delete-orphan")
     
     def __repr__(self):
         return f"<Batch {self.id} - {self.status}>"
@@ -34,6 +56,24 @@ class Image(Base):
     batch_id = Column(String, ForeignKey("batches.id"), nullable=False)
     file_path = Column(String, nullable=False)
     page_index = Column(Integer, default=0)  # For multi-page forms
+    content_hash = Column(String, nullable=True, index=True)  # sha256 of the uploaded bytes
+    document_id = Column(String, ForeignKey("source_documents.id"), nullable=True)  # Set for rasterized PDF/TIFF pages
+    ocr_path = Column(String, nullable=True)  # Deskewed copy used for OCR (original is kept for display)
+    
+    # Quality triage metrics (see ocr/quality.py)
+    sharpness = Column(Float, nullable=True)
+    ink_coverage = Column(Float, nullable=True)
+    brightness = Column(Float, nullable=True)
+    skew_angle = Column(Float, nullable=True)
+    quality_status = Column(String, nullable=True)  # ok | flagged | rejected
+    quality_notes = Column(Text, nullable=True)
+    
+    # Processing checkpoint: attempts so far and the last failure (cleared on success)
+    attempts = Column(Integer, nullable=True, default=0)
+    error_message = Column(Text, nullable=True)
+    # "<day>.zip:<member>" in LIFECYCLE_ARCHIVE_DIR once the original is archived
+    # (file_path then points to a re-encoded display copy)
+    archive_member = Column(String, nullable=True)
     uploaded_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
@@ -43,6 +83,26 @@ class Image(Base):
     def __repr__(self):
         return f"<Image {self.id} - Page {self.page_index}>"
 
+class SourceDocument(Base):
+    """Multi-page upload (PDF/TIFF) that the worker rasterizes into Image rows"""
+    __tablename__ = "source_documents"
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    batch_id = Column(String, ForeignKey("batches.id"), nullable=False)
+    file_path = Column(String, nullable=False)
+    content_hash = Column(String, nullable=True)
+    upload_index = Column(Integer, default=0)  # Position in the original upload
+    page_count = Column(Integer, nullable=True)  # Set once rasterized
+    rasterized = Column(Boolean, default=False)
+    archive_member = Column(String, nullable=True)  # "<day>.zip:<member>" once archived (file removed)
+    uploaded_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    batch = relationship("Batch", back_populates="documents")
+    
+    def __repr__(self):
+        return f"<SourceDocument {self.id} - {self.page_count or '?'} pages>"
+
 class OcrResult(Base):
     __tablename__ = "ocr_results"
     
@@ -50,8 +110,14 @@ class OcrResult(Base):
     image_id = Column(String, ForeignKey("images.id"), nullable=False)
     data_json = Column(Text, nullable=False)  # JSON string of extracted fields
     confidence_json = Column(Text, nullable=True)  # JSON string of confidence scores
-    raw_text = Column(Text, nullable=True)  # Raw OCR output
+    raw_text = Column(CompressibleText, nullable=True)  # Raw OCR output
+    ocr_lines_json = Column(CompressibleText, nullable=True)  # JSON list of OCR lines (text/confidence/bbox) for re-extraction
+    form_type = Column(String, nullable=True, index=True)  # Template used for extraction (resolved from AUTO)
+    method = Column(String, nullable=True)  # paddle_ocr | roi | gpt-4-vision | cascade
+    field_tiers_json = Column(Text, nullable=True)  # JSON {field: tier} for cascade results
     processed_at = Column(DateTime, default=datetime.utcnow)
+    # Worker time spent on this page (None for results reused from duplicate uploads)
+    processing_seconds = Column(Float, nullable=True)
     
     # Relationships
     image = relationship("Image", back_populates="ocr_result")
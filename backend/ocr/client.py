@@ -0,0 +1,89 @@
+"""
+Client backend for the local OCR inference server (ocr_server.py).
+
+Implements the same process_document / process_documents interface as
+OCRProcessor, but sends image paths to the server instead of loading
+PPStructure in this process. The server must see the same filesystem, so
+paths are sent as absolute paths. OCR_SERVER_URL is either
+http://host:port or unix:///path/to/socket.
+"""
+import http.client
+import json
+import logging
+import os
+import socket
+from typing import Any, List
+from urllib.parse import urlparse
+
+from config import OCR_SERVER_URL, OCR_SERVER_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+class OCRServerError(RuntimeError):
+    """OCR failed on the server for one page"""
+
+
+class OCRClient:
+    def __init__(self, url: str = OCR_SERVER_URL, timeout: float = OCR_SERVER_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+        parsed = urlparse(url)
+        self._socket_path = parsed.path if parsed.scheme == "unix" else None
+        self._host = parsed.hostname
+        self._port = parsed.port or 80
+
+    def process_document(self, image_path, form_type="AUTO", ocr_output=None):
+        """Same contract as OCRProcessor.process_document (ocr_output is not supported remotely)"""
+        result = self.process_documents([image_path], form_type)[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def process_documents(self, image_paths: List[str], form_type="AUTO", images=None) -> List[Any]:
+        """
+        Same contract as OCRProcessor.process_documents: one result dict or
+        Exception per path. Pre-decoded images are not sent; the server reads
+        the files itself.
+        """
+        payload = {"paths": [os.path.abspath(path) for path in image_paths], "form_type": form_type}
+        response = self._post("/process", payload)
+        results = []
+        for item in response["results"]:
+            if "error" in item:
+                results.append(OCRServerError(item["error"]))
+            else:
+                results.append(item["result"])
+        return results
+
+    def _connection(self) -> http.client.HTTPConnection:
+        if self._socket_path:
+            return _UnixHTTPConnection(self._socket_path, self.timeout)
+        return http.client.HTTPConnection(self._host, self._port, timeout=self.timeout)
+
+    def _post(self, path: str, payload: dict) -> dict:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        connection = self._connection()
+        try:
+            connection.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+            response = connection.getresponse()
+            data = response.read()
+        except OSError as exc:
+            raise ConnectionError(f"OCR server unavailable at {self.url}: {exc}") from exc
+        finally:
+            connection.close()
+        if response.status != 200:
+            raise RuntimeError(f"OCR server returned {response.status}: {data[:200]!r}")
+        return json.loads(data)
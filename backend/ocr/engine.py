@@ -0,0 +1,23 @@
+"""
+OCR backend selection.
+
+OCR_BACKEND=local (default) loads PPStructure in the calling process;
+OCR_BACKEND=server sends pages to the shared inference server (ocr_server.py),
+so API processes and RQ workers never import or load the OCR models.
+"""
+from config import OCR_BACKEND
+
+_client = None
+
+
+def get_processor():
+    """OCRProcessor singleton, or the inference server client"""
+    global _client
+    if OCR_BACKEND == "server":
+        if _client is None:
+            from .client import OCRClient
+            _client = OCRClient()
+        return _client
+
+    from .processor import get_processor as get_local_processor
+    return get_local_processor()
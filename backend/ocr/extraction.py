@@ -0,0 +1,178 @@
+"""
+Field extraction from OCR text.
+
+These helpers only work on text already produced by the OCR engine, so they can
+run without loading PaddleOCR (e.g. when re-extracting stored results).
+"""
+from pathlib import Path
+from typing import Dict, Any, List, Tuple, Optional
+
+from .templates import get_template
+
+# Confidence assigned to lines rebuilt from raw_text when per-line scores were not stored
+LEGACY_LINE_CONFIDENCE = 0.5
+
+
+def extract_structured_data(raw_text: str, form_type="GCCF_10K_P1", ocr_results=None):
+    """
+    Extract structured fields based on form template
+    """
+    template = get_template(form_type)
+    extracted_data = {}
+    field_confidences = {}
+
+    # Simple rule-based extraction (fallback)
+    # In a real scenario, we would use the bounding boxes from ocr_results
+    # to map text to fields based on spatial layout
+
+    lines = raw_text.split('\n')
+
+    for field in template["fields"]:
+        key = field["key"]
+        label = field["label"]
+
+        # Try to find the label in the text and get the value after it
+        value = None
+        confidence = 0.0
+
+        # 1. Direct line matching
+        for i, line in enumerate(lines):
+            if label in line:
+                # Value might be on the same line
+                parts = line.split(label)
+                if len(parts) > 1 and parts[1].strip():
+                    value = parts[1].strip().replace(":", "").replace("：", "").strip()
+                    confidence = 0.8
+                # Or on the next line
+                elif i + 1 < len(lines):
+                    value = lines[i+1].strip()
+                    confidence = 0.7
+                break
+
+        extracted_data[key] = value
+        field_confidences[key] = confidence
+
+    return extracted_data, field_confidences
+
+
+def template_based_extraction(
+    raw_text: str,
+    paddle_results: list,
+    form_type: str
+) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """
+    Extract fields using template matching on PaddleOCR results
+    This is a simple keyword-based approach - can be enhanced with regex/NLP
+    """
+    template = get_template(form_type)
+    data = {}
+    confidence = {}
+
+    for key, keywords in template.matchers:
+        # Try to find label in text and extract value after it
+        # This is very basic - enhance based on your specific forms
+        for line in paddle_results:
+            line_text = line["text"]
+            if any(keyword in line_text for keyword in keywords):
+                # Extract the value (simplified logic)
+                data[key] = line_text
+                confidence[key] = line["confidence"]
+                break
+
+        # Set defaults for missing fields
+        if key not in data:
+            data[key] = None
+            confidence[key] = 0.0
+
+    return data, confidence
+
+
+def detect_form_type(raw_text: str, image_path: str = "") -> str:
+    """
+    Heuristic form-type detection based on text cues and filename.
+    """
+    raw_text = raw_text or ""
+    text_lower = raw_text.lower()
+    fname = Path(image_path).name.lower() if image_path else ""
+
+    # Filename hints
+    if "a01" in fname or "roster" in fname or "owner" in fname or "mgt" in fname:
+        return "HOUSE_ROSTER"
+    if "p2" in fname:
+        return "GCCF_10K_P2"
+    if "p1" in fname:
+        return "GCCF_10K_P1"
+
+    # Content hints
+    if "調查人員" in raw_text or "聲明及承諾" in raw_text or "undertaking" in text_lower:
+        return "GCCF_10K_P2"
+    if "申請人家屬" in raw_text or "現職" in raw_text or "華人慈善基金" in raw_text:
+        return "GCCF_10K_P1"
+    if ("單位" in raw_text and "業主姓名" in raw_text) or "owner name" in text_lower:
+        return "HOUSE_ROSTER"
+
+    return "GCCF_10K_P1"
+
+
+def extract_fields(
+    raw_text: str,
+    paddle_results: list,
+    form_type: str
+) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """
+    Run layout and rule-based extraction and merge them per template field.
+    Falls back to {"full_text": raw_text} when no field could be filled.
+    """
+    layout_data, layout_conf = template_based_extraction(raw_text, paddle_results, form_type)
+    rule_data, rule_conf = extract_structured_data(raw_text, form_type, paddle_results)
+
+    # Merge heuristic extraction so we return whatever signal we have
+    merged_data = {}
+    merged_conf = {}
+    for key in get_template(form_type).field_keys:
+        layout_val = layout_data.get(key)
+        rule_val = rule_data.get(key)
+
+        if layout_val not in (None, ""):
+            merged_data[key] = layout_val
+            merged_conf[key] = layout_conf.get(key, 0.0)
+        elif rule_val not in (None, ""):
+            merged_data[key] = rule_val
+            merged_conf[key] = rule_conf.get(key, 0.0)
+        else:
+            merged_data[key] = None
+            merged_conf[key] = 0.0
+
+    # If nothing meaningful extracted, at least return full raw text
+    if not any(v for v in merged_data.values() if v not in (None, "")):
+        try:
+            confidences = [c for c in merged_conf.values() if isinstance(c, (int, float))]
+            avg = sum(confidences) / len(confidences) if confidences else 0.0
+        except Exception:
+            avg = 0.0
+        return {"full_text": raw_text}, {"full_text": avg}
+
+    return merged_data, merged_conf
+
+
+def serialize_lines(paddle_results: Optional[list]) -> List[Dict[str, Any]]:
+    """Convert OCR line results into JSON-safe dicts (numpy values → builtins)"""
+    lines = []
+    for item in paddle_results or []:
+        bbox = item.get("bbox")
+        lines.append({
+            "text": str(item.get("text", "")),
+            "confidence": float(item.get("confidence", 0.0) or 0.0),
+            "bbox": [float(v) for v in bbox] if bbox is not None else None,
+            "type": item.get("type"),
+        })
+    return lines
+
+
+def lines_from_raw_text(raw_text: str) -> List[Dict[str, Any]]:
+    """Rebuild line results from raw_text for rows stored without per-line output"""
+    return [
+        {"text": line, "confidence": LEGACY_LINE_CONFIDENCE}
+        for line in (raw_text or "").split("\n")
+        if line.strip() and line != "[TABLE DATA]"
+    ]
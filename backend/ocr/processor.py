@@ -5,20 +5,48 @@ import base64
 import json
 import logging
 from pathlib import Path
-from typing import Dict, Any, Tuple, Optional
+from typing import Dict, Any, List, Tuple, Optional
 import os
 from paddleocr import PPStructure, draw_structure_result, save_structure_res
 from paddleocr.ppstructure.recovery.recovery_to_doc import sorted_layout_boxes, convert_info_docx
-from .templates import FORM_TEMPLATES, get_template
+from config import OCR_REC_BATCH_SIZE, OCR_BATCH_PAGES, OCR_EXTRACTION_MODE, TEMPLATE_REGISTRATION, CASCADE_CONFIDENCE_THRESHOLD
+from .templates import get_template, get_field_labels, get_field_regions
+from . import extraction
+from .registration import register_to_template, warp_region
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Style markup PPStructure strips from recognized text
+STYLE_TOKENS = ['<strike>', '</strike>', '<sup>', '</sup>', '<sub>', '</sub>', '<b>', '</b>', '<i>', '</i>']
+
+class _DeferredRecognizer:
+    """
+    Stands in for TextSystem.text_recognizer while PPStructure runs: records the
+    crops and answers with placeholder texts (scored to pass drop_score) that
+    extract_text_paddle_batch resolves after one pooled recognition pass
+    """
+
+    def __init__(self):
+        self.crops = []
+
+    def __call__(self, img_list):
+        start = len(self.crops)
+        self.crops.extend(img_list)
+        return [(f"\x00{start + i}\x00", 1.0) for i in range(len(img_list))], 0.0
+
+    @staticmethod
+    def slot(placeholder: str) -> int:
+        return int(placeholder.strip("\x00"))
+
+
 class OCRProcessor:
     
     def __init__(self):
         self.pp_structure = None
+        # Pages already decoded by the caller (e.g. the pipeline's decode stage), keyed by path
+        self._decoded_pages = {}
         # Initialize PP-StructureV2 for Layout Analysis and Table Recognition
         # table=True enables table recognition
         # ocr=True enables text recognition within blocks
@@ -73,159 +101,298 @@ class OCRProcessor:
         
         return img, gray
 
-    def extract_text_paddle(self, image_path):
+    def extract_text_paddle(self, image_path, enhance=False):
         """
         Use PP-StructureV2 to extract text and structure
+        enhance: run on the denoised, contrast-enhanced image (slower)
         """
         try:
-            if not self.pp_structure:
-                raise RuntimeError("PP-Structure is not initialized.")
-
-            if not Path(image_path).exists():
-                raise FileNotFoundError(f"Image not found: {image_path}")
-
-            img = cv2.imread(image_path)
-            if img is None:
-                raise ValueError(f"Failed to read image from path: {image_path}")
+            img = self._read_image(image_path)
+            if enhance:
+                _, gray = self.preprocess_image(image_path)
+                img = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
             
             # Run layout analysis
             result = self.pp_structure(img)
-            
-            # Extract text from results
-            # PPStructure returns a list of dicts, each containing 'type', 'bbox', 'res'
-            # 'res' contains 'text_region', 'text', 'confidence' etc.
-            
-            full_text = []
-            structured_data = []
-            
+            del img
+            # Regions carry their image crop ('img'); drop them before parsing
             for region in result or []:
-                region_type = region.get('type', '')
-                res = region.get('res', [])
-                
-                # Handle Table regions
-                if region_type == 'table':
-                    # Table html is in res['html'] – extract plain text as fallback
-                    if isinstance(res, dict):
-                        html = res.get('html') or ''
-                        if html:
-                            import re
-                            plain = re.sub('<[^<]+?>', ' ', html)
-                            plain = ' '.join(plain.split())
-                            if plain:
-                                full_text.append(plain)
-                        # some versions store cell texts under 'cell'
-                        cells = res.get('cell') or res.get('cells') or []
-                        if isinstance(cells, list):
-                            for c in cells:
-                                txt = c.get('text') if isinstance(c, dict) else None
-                                if txt:
-                                    full_text.append(txt)
-                    # keep placeholder to signal table presence
-                    full_text.append("[TABLE DATA]")
-                
-                # Handle Text/Title/Header regions
-                elif region_type in ['text', 'title', 'header', 'footer']:
-                    # For text regions, res is a list of dicts with 'text' field
-                    # Note: PPStructure structure might vary slightly by version, 
-                    # but typically for 'text' type, 'res' is a list of line results
-                    if isinstance(res, list):
-                        for line in res:
-                            if isinstance(line, dict) and 'text' in line:
-                                text = line['text']
-                                confidence = line.get('confidence', 0.0)
-                                full_text.append(text)
-                                structured_data.append({
-                                    "text": text,
-                                    "confidence": confidence,
-                                    "bbox": region.get('bbox'),
-                                    "type": region_type
-                                })
-            
-            raw_text = "\n".join(full_text)
-
-            if not raw_text.strip():
-                raise ValueError("OCR engine returned empty text.")
+                region.pop('img', None)
             
-            # Calculate average confidence
-            confidences = [item['confidence'] for item in structured_data if 'confidence' in item]
-            avg_confidence = sum(confidences) / len(confidences) if confidences else 0.0
-            
-            return raw_text, avg_confidence, structured_data
+            return self._parse_structure_result(result)
             
         except Exception as e:
             logger.exception("PaddleOCR processing failed for %s", image_path)
             # Bubble up so caller can mark the batch as failed
             raise
 
-    def extract_structured_data(self, raw_text: str, form_type="GCCF_10K_P1", ocr_results=None):
+    def extract_text_paddle_batch(self, image_paths: List[str]) -> List[Any]:
         """
-        Extract structured fields based on form template
+        Batched variant of extract_text_paddle for several pages.
+        Each page still runs through PPStructure as-is (layout, tables, recovery
+        text detection, angle classification); only its text recognizer call is
+        deferred, so the crops of all pages are recognized together in large
+        batches (OCR_REC_BATCH_SIZE) and the results resolved into each page.
+        Returns one (raw_text, avg_confidence, structured_data) tuple or
+        Exception per input path, in order; None for pages that should go
+        through the per-page path because grouped recognition failed.
         """
-        template = FORM_TEMPLATES.get(form_type, FORM_TEMPLATES["GCCF_10K_P1"])
-        extracted_data = {}
-        field_confidences = {}
-        
-        # Simple rule-based extraction (fallback)
-        # In a real scenario, we would use the bounding boxes from ocr_results 
-        # to map text to fields based on spatial layout
+        outputs: List[Any] = [None] * len(image_paths)
+        pages = []  # (output index, regions)
+        text_system = self.pp_structure.text_system
+        recognizer = text_system.text_recognizer
+        deferred = _DeferredRecognizer()
+
+        # The table system keeps its own recognizer reference, so tables are recognized per page as usual
+        text_system.text_recognizer = deferred
+        try:
+            for idx, image_path in enumerate(image_paths):
+                try:
+                    img = self._read_image(image_path)
+                    regions = self.pp_structure(img)
+                    # Only the deferred text crops are needed from here on; later tiers re-read from disk
+                    del img
+                    self._decoded_pages.pop(image_path, None)
+                    for region in regions or []:
+                        region.pop('img', None)
+                    pages.append((idx, regions))
+                except Exception as exc:
+                    logger.exception("PaddleOCR processing failed for %s", image_path)
+                    outputs[idx] = exc
+        finally:
+            text_system.text_recognizer = recognizer
+
+        # Recognize all pages' crops in one pass
+        rec_res = []
+        if deferred.crops:
+            default_batch_num = recognizer.rec_batch_num
+            recognizer.rec_batch_num = OCR_REC_BATCH_SIZE
+            try:
+                rec_res, _ = recognizer(deferred.crops)
+            except Exception:
+                # One bad crop must not fail the whole group: leave these pages to the
+                # per-page path (process_document runs extract_text_paddle when given None)
+                logger.exception("Batched recognition failed for %d pages; falling back to per-page OCR", len(pages))
+                for idx, _ in pages:
+                    outputs[idx] = None
+                return outputs
+            finally:
+                recognizer.rec_batch_num = default_batch_num
+        deferred.crops = []
+
+        for idx, regions in pages:
+            try:
+                for region in regions or []:
+                    if region.get('type') == 'table' or not isinstance(region.get('res'), list):
+                        continue
+                    lines = []
+                    for line in region['res']:
+                        rec_str, rec_conf = rec_res[deferred.slot(line['text'])]
+                        # The filters TextSystem and PPStructure apply to live results
+                        if rec_conf < text_system.drop_score:
+                            continue
+                        for token in STYLE_TOKENS:
+                            rec_str = rec_str.replace(token, '')
+                        line.update(text=rec_str, confidence=float(rec_conf))
+                        lines.append(line)
+                    region['res'] = lines
+                outputs[idx] = self._parse_structure_result(regions)
+            except Exception as exc:
+                logger.exception("PaddleOCR processing failed for %s", image_paths[idx])
+                outputs[idx] = exc
+
+        return outputs
+
+    def _read_image(self, image_path):
+        if not self.pp_structure:
+            raise RuntimeError("PP-Structure is not initialized.")
+
+        if not Path(image_path).exists():
+            raise FileNotFoundError(f"Image not found: {image_path}")
+
+        img = self._decoded_pages.get(image_path)
+        if img is not None:
+            return img
+
+        img = cv2.imread(image_path)
+        if img is None:
+            raise ValueError(f"Failed to read image from path: {image_path}")
+        return img
+
+    def _parse_structure_result(self, result):
+        """
+        Flatten PPStructure regions into (raw_text, avg_confidence, structured_data)
+        """
+        # Extract text from results
+        # PPStructure returns a list of dicts, each containing 'type', 'bbox', 'res'
+        # 'res' contains 'text_region', 'text', 'confidence' etc.
         
-        lines = raw_text.split('\n')
+        full_text = []
+        structured_data = []
         
-        for field in template["fields"]:
-            key = field["key"]
-            label = field["label"]
+        for region in result or []:
+            region_type = region.get('type', '')
+            res = region.get('res', [])
             
-            # Try to find the label in the text and get the value after it
-            value = None
-            confidence = 0.0
+            # Handle Table regions
+            if region_type == 'table':
+                # Table html is in res['html'] – extract plain text as fallback
+                if isinstance(res, dict):
+                    html = res.get('html') or ''
+                    if html:
+                        import re
+                        plain = re.sub('<[^<]+?>', ' ', html)
+                        plain = ' '.join(plain.split())
+                        if plain:
+                            full_text.append(plain)
+                    # some versions store cell texts under 'cell'
+                    cells = res.get('cell') or res.get('cells') or []
+                    if isinstance(cells, list):
+                        for c in cells:
+                            txt = c.get('text') if isinstance(c, dict) else None
+                            if txt:
+                                full_text.append(txt)
+                # keep placeholder to signal table presence
+                full_text.append("[TABLE DATA]")
             
-            # 1. Direct line matching
-            for i, line in enumerate(lines):
-                if label in line:
-                    # Value might be on the same line
-                    parts = line.split(label)
-                    if len(parts) > 1 and parts[1].strip():
-                        value = parts[1].strip().replace(":", "").replace("：", "").strip()
-                        confidence = 0.8
-                    # Or on the next line
-                    elif i + 1 < len(lines):
-                        value = lines[i+1].strip()
-                        confidence = 0.7
-                    break
-            
-            extracted_data[key] = value
-            field_confidences[key] = confidence
+            # Handle Text/Title/Header regions
+            elif region_type in ['text', 'title', 'header', 'footer']:
+                # For text regions, res is a list of dicts with 'text' field
+                # Note: PPStructure structure might vary slightly by version, 
+                # but typically for 'text' type, 'res' is a list of line results
+                if isinstance(res, list):
+                    for line in res:
+                        if isinstance(line, dict) and 'text' in line:
+                            text = line['text']
+                            confidence = line.get('confidence', 0.0)
+                            full_text.append(text)
+                            structured_data.append({
+                                "text": text,
+                                "confidence": confidence,
+                                "bbox": region.get('bbox'),
+                                "type": region_type
+                            })
+        
+        raw_text = "\n".join(full_text)
+
+        if not raw_text.strip():
+            raise ValueError("OCR engine returned empty text.")
+        
+        # Calculate average confidence
+        confidences = [item['confidence'] for item in structured_data if 'confidence' in item]
+        avg_confidence = sum(confidences) / len(confidences) if confidences else 0.0
+        
+        return raw_text, avg_confidence, structured_data
+
+    def extract_fields_roi(self, image_path, form_type):
+        """
+        Read only the field regions declared by the template, skipping layout
+        analysis and whole-page OCR. The page is first registered onto the
+        template reference image when one is available. Single-line fields are recognized directly
+        in one batch; multiline fields and table grid cells run text detection
+        inside their crop. Returns (data, confidence, lines).
+        """
+        img = self._read_image(image_path)
+        alignment = register_to_template(img, form_type) if TEMPLATE_REGISTRATION else None
+        if alignment is not None:
+            homography, (w, h) = alignment
+        else:
+            h, w = img.shape[:2]
+        text_system = self.pp_structure.text_system
+
+        template = get_template(form_type)
+        data = dict.fromkeys(template.field_keys)
+        confidence = dict.fromkeys(template.field_keys, 0.0)
+        lines = []
+
+        def crop(region):
+            box = [int(region[0] * w), int(region[1] * h), int(region[2] * w), int(region[3] * h)]
+            if alignment is not None:
+                return warp_region(img, homography, box), box
+            x0, y0, x1, y1 = box
+            return img[y0:y1, x0:x1], box
 
-        return extracted_data, field_confidences
+        def read_multiline(roi, bbox):
+            if roi.size == 0:
+                return None, 0.0
+            _, rec_res, _ = text_system(roi)
+            texts = [(text.strip(), score) for text, score in (rec_res or []) if text.strip()]
+            if not texts:
+                return None, 0.0
+            text = " ".join(t for t, _ in texts)
+            score = sum(sc for _, sc in texts) / len(texts)
+            lines.append({"text": text, "confidence": score, "bbox": bbox, "type": "roi"})
+            return text, score
+
+        single_crops = []
+        single_slots = []
+        for field in get_field_regions(form_type):
+            key = field["key"]
+            if field.get("columns"):
+                # Fixed grid: equal-height rows inside the region, columns by x range
+                x0, y0, x1, y1 = field["region"]
+                row_count = field.get("rows", 1)
+                row_height = (y1 - y0) / row_count
+                rows = []
+                scores = []
+                for r in range(row_count):
+                    row = {}
+                    for column, (cx0, cx1) in field["columns"].items():
+                        roi, bbox = crop([cx0, y0 + r * row_height, cx1, y0 + (r + 1) * row_height])
+                        row[column], score = read_multiline(roi, bbox)
+                        if row[column]:
+                            scores.append(score)
+                    if any(row.values()):
+                        rows.append(row)
+                if rows:
+                    data[key] = rows
+                    confidence[key] = sum(scores) / len(scores)
+            elif field.get("multiline"):
+                roi, bbox = crop(field["region"])
+                text, score = read_multiline(roi, bbox)
+                if text:
+                    data[key], confidence[key] = text, score
+            else:
+                roi, bbox = crop(field["region"])
+                if roi.size:
+                    single_crops.append(roi)
+                    single_slots.append((key, bbox))
+
+        if single_crops:
+            recognizer = text_system.text_recognizer
+            default_batch_num = recognizer.rec_batch_num
+            recognizer.rec_batch_num = OCR_REC_BATCH_SIZE
+            try:
+                rec_res, _ = recognizer(single_crops)
+            finally:
+                recognizer.rec_batch_num = default_batch_num
+            del single_crops
+            for (key, bbox), (text, score) in zip(single_slots, rec_res):
+                for token in STYLE_TOKENS:
+                    text = text.replace(token, '')
+                text = text.strip()
+                if text and score >= text_system.drop_score:
+                    data[key], confidence[key] = text, float(score)
+                    lines.append({"text": text, "confidence": float(score), "bbox": bbox, "type": "roi"})
+
+        return data, confidence, lines
+
+    def extract_structured_data(self, raw_text: str, form_type="GCCF_10K_P1", ocr_results=None):
+        """
+        Extract structured fields based on form template
+        """
+        return extraction.extract_structured_data(raw_text, form_type, ocr_results)
 
     def detect_form_type(self, raw_text: str, image_path: str = "") -> str:
         """
         Heuristic form-type detection based on text cues and filename.
         """
-        text_lower = (raw_text or "").lower()
-        fname = Path(image_path).name.lower() if image_path else ""
-
-        # Filename hints
-        if "a01" in fname or "roster" in fname or "owner" in fname or "mgt" in fname:
-            return "HOUSE_ROSTER"
-        if "p2" in fname:
-            return "GCCF_10K_P2"
-        if "p1" in fname:
-            return "GCCF_10K_P1"
-
-        # Content hints
-        if "調查人員" in raw_text or "聲明及承諾" in raw_text or "undertaking" in text_lower:
-            return "GCCF_10K_P2"
-        if "申請人家屬" in raw_text or "現職" in raw_text or "華人慈善基金" in raw_text:
-            return "GCCF_10K_P1"
-        if ("單位" in raw_text and "業主姓名" in raw_text) or "owner name" in text_lower:
-            return "HOUSE_ROSTER"
-
-        return "GCCF_10K_P1"
-
-    def extract_with_gpt_vision(self, image_path, form_type="GCCF_10K_P1"):
+        return extraction.detect_form_type(raw_text, image_path)
+
+    def extract_with_gpt_vision(self, image_path, form_type="GCCF_10K_P1", keys=None):
         """
         Use GPT-4 Vision for intelligent extraction
+        keys: only ask for these fields (used by the cascade)
         """
         if not self.use_gpt_vision or not self.client:
             return None, None
@@ -237,9 +404,11 @@ class OCRProcessor:
                 return base64.b64encode(image_file.read()).decode('utf-8')
 
         base64_image = encode_image(image_path)
-        template = FORM_TEMPLATES.get(form_type, FORM_TEMPLATES["GCCF_10K_P1"])
+        template = get_template(form_type)
         
         prompt = template.get("gpt_prompt", "Extract all fields from this form.")
+        if keys:
+            prompt += f"\n只需返回以下欄位（key）：{', '.join(keys)}"
 
         try:
             response = self.client.chat.completions.create(
@@ -287,7 +456,7 @@ class OCRProcessor:
 
     # Assuming there's a process_document method that uses the above
     # Adding a placeholder for context based on the user's edit
-    def process_document(self, image_path, form_type="AUTO"):
+    def process_document(self, image_path, form_type="AUTO", ocr_output=None):
         """
         End-to-end document processing that returns a unified result dict
         expected by downstream callers:
@@ -295,19 +464,43 @@ class OCRProcessor:
           "data": {...},
           "confidence": {...},
           "raw_text": "...",
-          "method": "paddle_ocr" | "gpt-4-vision",
-          "form_type": "detected template name"
+          "lines": [...],  # per-line OCR output, kept for re-extraction
+          "method": "paddle_ocr" | "roi" | "gpt-4-vision" | "cascade",
+          "form_type": "detected template name",
+          "field_tiers": {...}  # cascade only: tier that produced each field
         }
+        ocr_output: precomputed extract_text_paddle() tuple (used by batched mode)
         """
 
-        result = {"data": {}, "confidence": {}, "raw_text": "", "method": "paddle_ocr", "form_type": form_type}
+        result = {"data": {}, "confidence": {}, "raw_text": "", "lines": [], "method": "paddle_ocr", "form_type": form_type}
+        
+        if OCR_EXTRACTION_MODE == "cascade":
+            return self._process_cascade(image_path, form_type, result, ocr_output)
+        
+        # ROI mode: known fixed-layout forms only need their field regions read
+        if self._use_roi(form_type):
+            data, confidence, lines = self.extract_fields_roi(image_path, form_type)
+            if any(v not in (None, "") for v in data.values()):
+                result.update({
+                    "data": data,
+                    "confidence": confidence,
+                    "raw_text": self._roi_raw_text(data, form_type),
+                    "lines": extraction.serialize_lines(lines),
+                    "method": "roi",
+                })
+                return result
+            # Nothing read inside the regions (e.g. misaligned photo): fall back to full OCR
+            logger.warning("ROI extraction found no text in %s, falling back to full OCR", image_path)
         
         # Preprocess image (optional, depending on PaddleOCR's internal preprocessing)
         # img, gray_img = self.preprocess_image(image_path)
         
         # Extract text and structure using PaddleOCR
-        raw_text, avg_confidence, paddle_results = self.extract_text_paddle(image_path)
+        if ocr_output is None:
+            ocr_output = self.extract_text_paddle(image_path)
+        raw_text, avg_confidence, paddle_results = ocr_output
         result["raw_text"] = raw_text
+        result["lines"] = extraction.serialize_lines(paddle_results)
 
         # Auto-detect form if required
         detected_type = form_type
@@ -330,45 +523,159 @@ class OCRProcessor:
                 logger.error(f"GPT-4 Vision failed, falling back to template matching: {e}")
 
         # Fallback: Use template-based extraction from PaddleOCR results
-        layout_data, layout_conf = self._template_based_extraction(
+        result["data"], result["confidence"] = extraction.extract_fields(
             raw_text, paddle_results, detected_type
         )
-        rule_data, rule_conf = self.extract_structured_data(raw_text, detected_type, paddle_results)
+        
+        return result
+    
+    def _process_cascade(self, image_path, form_type, result, ocr_output=None):
+        """
+        Confidence-driven cascade: run the cheapest local extraction first and
+        escalate only fields below the template's confidence_threshold, first
+        to a heavier local profile, then to GPT Vision (if enabled).
+        Tiers: roi -> paddle_ocr -> gpt-4-vision for templates with regions,
+        otherwise paddle_ocr -> paddle_ocr_enhanced -> gpt-4-vision.
+        """
+        detected_type = form_type
+        data, confidence, tiers = {}, {}, {}
+        roi_text, full_text = "", ""
 
-        # Merge heuristic extraction so we return whatever signal we have
-        merged_data = {}
-        merged_conf = {}
-        template = get_template(detected_type)
-        for field in template["fields"]:
-            key = field["key"]
-            layout_val = layout_data.get(key)
-            rule_val = rule_data.get(key)
-
-            if layout_val not in (None, ""):
-                merged_data[key] = layout_val
-                merged_conf[key] = layout_conf.get(key, 0.0)
-            elif rule_val not in (None, ""):
-                merged_data[key] = rule_val
-                merged_conf[key] = rule_conf.get(key, 0.0)
-            else:
-                merged_data[key] = None
-                merged_conf[key] = 0.0
+        def template_keys():
+            return list(get_template(detected_type).field_keys)
+
+        def low_fields():
+            template = get_template(detected_type)
+            threshold = template.get("confidence_threshold", CASCADE_CONFIDENCE_THRESHOLD)
+            return [key for key in template_keys() if confidence.get(key, 0.0) < threshold]
 
-        result["data"] = merged_data
-        result["confidence"] = merged_conf
+        def merge(tier, tier_data, tier_conf, keys):
+            for key in keys:
+                value = tier_data.get(key)
+                if value in (None, "", []):
+                    continue
+                score = float(tier_conf.get(key, 0.0) or 0.0)
+                if data.get(key) in (None, "", []) or score > confidence.get(key, 0.0):
+                    data[key], confidence[key], tiers[key] = value, score, tier
 
-        # If nothing meaningful extracted, at least return full raw text
-        if not any(v for v in result["data"].values() if v not in (None, "")):
-            result["data"] = {"full_text": raw_text}
-            # use average confidence if available, else 0
+        local_tiers = ["roi", "paddle_ocr"] if self._has_roi(form_type) else ["paddle_ocr", "paddle_ocr_enhanced"]
+        for position, tier in enumerate(local_tiers):
+            keys = low_fields() if position else None
+            if position and not keys:
+                break
             try:
-                confidences = [c for c in result["confidence"].values() if isinstance(c, (int, float))]
-                avg = sum(confidences) / len(confidences) if confidences else 0.0
+                if tier == "roi":
+                    tier_data, tier_conf, lines = self.extract_fields_roi(image_path, form_type)
+                    roi_text = self._roi_raw_text(tier_data, form_type)
+                    result["lines"] = extraction.serialize_lines(lines)
+                else:
+                    if tier == "paddle_ocr" and ocr_output is not None:
+                        raw_text, _, paddle_results = ocr_output
+                    else:
+                        raw_text, _, paddle_results = self.extract_text_paddle(
+                            image_path, enhance=(tier == "paddle_ocr_enhanced")
+                        )
+                    if detected_type in (None, "", "AUTO"):
+                        detected_type = self.detect_form_type(raw_text, image_path)
+                    tier_data, tier_conf = extraction.extract_fields(raw_text, paddle_results, detected_type)
+                    full_text = raw_text
+                    result["lines"] = extraction.serialize_lines(paddle_results)
             except Exception:
-                avg = 0.0
-            result["confidence"] = {"full_text": avg}
-        
+                # An escalation tier failing must not lose what earlier tiers found
+                if not data and not roi_text and not full_text and position == len(local_tiers) - 1:
+                    raise
+                logger.warning("Cascade tier %s failed for %s", tier, image_path, exc_info=True)
+                continue
+            merge(tier, tier_data, tier_conf, keys or template_keys())
+
+        escalate = low_fields()
+        if escalate and self.use_gpt_vision and self.client:
+            gpt_data, _ = self.extract_with_gpt_vision(image_path, detected_type, keys=escalate)
+            if gpt_data:
+                # Some prompts wrap the fields as {"data": {...}, "confidence": {...}}
+                if isinstance(gpt_data.get("data"), dict):
+                    gpt_data = gpt_data["data"]
+                merge("gpt-4-vision", gpt_data, {key: 0.95 for key in gpt_data}, escalate)
+
+        raw_text = full_text or roi_text
+        if not raw_text.strip() and not tiers:
+            raise ValueError("OCR engine returned empty text.")
+
+        for key in template_keys():
+            data.setdefault(key, None)
+            confidence.setdefault(key, 0.0)
+        if not tiers:
+            data, confidence = {"full_text": raw_text}, {"full_text": 0.0}
+
+        logger.info("Cascade for %s: %s", image_path,
+                    {tier: sum(1 for t in tiers.values() if t == tier) for tier in set(tiers.values())})
+        result.update({
+            "data": data,
+            "confidence": confidence,
+            "raw_text": raw_text or "\n".join(str(v) for v in data.values() if v),
+            "method": "cascade",
+            "form_type": detected_type,
+            "field_tiers": tiers,
+        })
         return result
+
+    def _roi_raw_text(self, data, form_type) -> str:
+        """Readable text of ROI results (label: value per line, table rows flattened)"""
+        labels = get_field_labels(form_type)
+        return "\n".join(
+            f"{labels.get(key, key)}: {value}" if isinstance(value, str)
+            else "\n".join(" ".join(cell for cell in row.values() if cell) for row in value)
+            for key, value in data.items() if value
+        )
+
+    def _has_roi(self, form_type) -> bool:
+        """Whether the form type is explicit and its template declares regions"""
+        return form_type not in (None, "", "AUTO") and bool(get_field_regions(form_type))
+
+    def _use_roi(self, form_type) -> bool:
+        """ROI extraction applies to explicitly chosen templates that declare regions"""
+        return OCR_EXTRACTION_MODE in ("roi", "cascade") and self._has_roi(form_type)
+
+    def process_documents(self, image_paths: List[str], form_type="AUTO", images=None) -> List[Any]:
+        """
+        Process several pages, sharing text recognition batches across groups of
+        OCR_BATCH_PAGES of them (per page when it is 1, whoever the caller is).
+        images: optional BGR arrays already decoded for image_paths (same order);
+        the list is emptied so each page can be freed as soon as it is done
+        Returns one process_document() result dict or Exception per path.
+        """
+        if images is not None:
+            self._decoded_pages.update(
+                (path, img) for path, img in zip(image_paths, images) if img is not None
+            )
+            images.clear()
+        try:
+            group_size = max(1, OCR_BATCH_PAGES)
+            if group_size == 1 or len(image_paths) == 1 or self._use_roi(form_type):
+                ocr_outputs = [None] * len(image_paths)
+            else:
+                ocr_outputs = []
+                for start in range(0, len(image_paths), group_size):
+                    group = image_paths[start:start + group_size]
+                    if len(group) == 1:
+                        ocr_outputs.append(None)
+                    else:
+                        ocr_outputs.extend(self.extract_text_paddle_batch(group))
+
+            results = []
+            for image_path, ocr_output in zip(image_paths, ocr_outputs):
+                if isinstance(ocr_output, Exception):
+                    results.append(ocr_output)
+                    continue
+                try:
+                    results.append(self.process_document(image_path, form_type, ocr_output=ocr_output))
+                except Exception as exc:
+                    results.append(exc)
+                self._decoded_pages.pop(image_path, None)
+            return results
+        finally:
+            for image_path in image_paths:
+                self._decoded_pages.pop(image_path, None)
     
     def _template_based_extraction(
         self, 
@@ -380,34 +687,7 @@ class OCRProcessor:
         Extract fields using template matching on PaddleOCR results
         This is a simple keyword-based approach - can be enhanced with regex/NLP
         """
-        template = get_template(form_type)
-        data = {}
-        confidence = {}
-        
-        # Simple keyword matching for demonstration
-        # In production, you'd use more sophisticated NLP or regex patterns
-        text_lower = raw_text.lower()
-        
-        for field in template["fields"]:
-            key = field["key"]
-            label = field["label"]
-            
-            # Try to find label in text and extract value after it
-            # This is very basic - enhance based on your specific forms
-            for line in paddle_results:
-                line_text = line["text"]
-                if label in line_text or any(keyword in line_text for keyword in [key, label.replace("申請人", "")]):
-                    # Extract the value (simplified logic)
-                    data[key] = line_text
-                    confidence[key] = line["confidence"]
-                    break
-            
-            # Set defaults for missing fields
-            if key not in data:
-                data[key] = None
-                confidence[key] = 0.0
-        
-        return data, confidence
+        return extraction.template_based_extraction(raw_text, paddle_results, form_type)
 
 # Global processor instance
 _processor = None
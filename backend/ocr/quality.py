@@ -0,0 +1,145 @@
+"""
+Fast image quality triage before OCR.
+
+Metrics are computed on a reduced-resolution decode so triage costs tens of
+milliseconds per page instead of a full decode:
+- sharpness: variance of the Laplacian (low = blurry)
+- ink_coverage: fraction of dark pixels after Otsu binarization (low = blank)
+- brightness: mean intensity (informational: white paper dominates it, so a
+  clean sparse page is naturally close to 255)
+- exposure: judged on the paper level (90th percentile), the ink/paper
+  contrast and the fraction of clipped pixels. A page is only rejected when
+  nearly all of it is clipped to black or white and the ink has no contrast
+  left; dark paper or washed-out ink is flagged and still OCR'd
+- skew_angle: median angle of near-horizontal lines (degrees, counter-clockwise)
+
+Pages are classified ok / flagged / rejected; salvageable skewed pages are
+deskewed into a separate file that is used for OCR.
+"""
+import logging
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import cv2
+import numpy as np
+
+from config import (
+    QUALITY_MIN_SHARPNESS, QUALITY_FLAG_SHARPNESS, QUALITY_MIN_INK,
+    QUALITY_MIN_BRIGHTNESS, QUALITY_MIN_CONTRAST, QUALITY_MAX_CLIPPED, QUALITY_MAX_SKEW,
+)
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_MAX_EDGE = 1000
+SKEW_MAX_EDGE = 600  # Hough cost grows with edge pixels; rules and baselines survive this size
+MIN_DESKEW_ANGLE = 0.5  # Degrees; smaller skews don't affect recognition
+
+
+def _load_small(image_path: str) -> Optional[np.ndarray]:
+    # Let the JPEG decoder downscale instead of decoding full resolution
+    gray = cv2.imread(image_path, cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    if gray is None:
+        return None
+    return _fit(gray, ANALYSIS_MAX_EDGE)
+
+
+def _fit(gray: np.ndarray, max_edge: int) -> np.ndarray:
+    h, w = gray.shape[:2]
+    scale = max_edge / float(max(h, w))
+    if scale < 1.0:
+        gray = cv2.resize(gray, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+    return gray
+
+
+def _estimate_skew(gray: np.ndarray) -> float:
+    """Median angle of near-horizontal line segments (printed rules, text baselines)"""
+    gray = _fit(gray, SKEW_MAX_EDGE)
+    edges = cv2.Canny(gray, 50, 150)
+    min_length = gray.shape[1] // 6
+    segments = cv2.HoughLinesP(edges, 1, np.pi / 360, threshold=60, minLineLength=min_length, maxLineGap=5)
+    if segments is None:
+        return 0.0
+    angles = []
+    for x1, y1, x2, y2 in segments.reshape(-1, 4):
+        angle = np.degrees(np.arctan2(y2 - y1, x2 - x1))
+        if abs(angle) <= 45:
+            angles.append(angle)
+    if not angles:
+        return 0.0
+    # Image y grows downwards; report counter-clockwise rotation of the content
+    return float(-np.median(angles))
+
+
+def assess_image(image_path: str) -> Dict[str, Any]:
+    """
+    Compute quality metrics and a verdict for one page.
+    Returns {"sharpness", "ink_coverage", "brightness", "paper_level", "contrast",
+             "clipped", "skew_angle", "status": ok|flagged|rejected, "notes": [...]}.
+    """
+    gray = _load_small(image_path)
+    if gray is None:
+        return {"status": "rejected", "notes": ["unreadable image"]}
+
+    sharpness = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    ink_coverage = float(np.count_nonzero(binary)) / binary.size
+    brightness = float(gray.mean())
+    paper_level = float(np.percentile(gray, 90))
+    ink = gray[binary > 0]
+    # Typical ink darkness vs. the paper; sparse pages still have enough ink pixels for a median
+    contrast = paper_level - float(np.median(ink)) if ink.size else 0.0
+    dark_clipped = float(np.count_nonzero(gray < 5)) / gray.size
+    bright_clipped = float(np.count_nonzero(gray > 250)) / gray.size
+    skew_angle = _estimate_skew(gray)
+
+    rejected, flagged = [], []
+    if ink_coverage < QUALITY_MIN_INK:
+        rejected.append("blank page")
+    if sharpness < QUALITY_MIN_SHARPNESS:
+        rejected.append("too blurry")
+    elif sharpness < QUALITY_FLAG_SHARPNESS:
+        flagged.append("blurry")
+    # Clean white paper is itself mostly clipped: only reject when the ink is gone as well
+    if dark_clipped >= QUALITY_MAX_CLIPPED and contrast < QUALITY_MIN_CONTRAST:
+        rejected.append("underexposed")
+    elif bright_clipped >= QUALITY_MAX_CLIPPED and contrast < QUALITY_MIN_CONTRAST:
+        rejected.append("overexposed")
+    elif paper_level < QUALITY_MIN_BRIGHTNESS:
+        flagged.append("dark page")
+    elif contrast < QUALITY_MIN_CONTRAST:
+        flagged.append("low contrast")
+    if abs(skew_angle) > QUALITY_MAX_SKEW:
+        flagged.append(f"skew {skew_angle:.1f}° too large to correct")
+
+    return {
+        "sharpness": round(sharpness, 2),
+        "ink_coverage": round(ink_coverage, 4),
+        "brightness": round(brightness, 1),
+        "paper_level": round(paper_level, 1),
+        "contrast": round(contrast, 1),
+        "clipped": round(dark_clipped + bright_clipped, 4),
+        "skew_angle": round(skew_angle, 2),
+        "status": "rejected" if rejected else ("flagged" if flagged else "ok"),
+        "notes": rejected + flagged,
+    }
+
+
+def deskew_image(image_path: str, angle: float) -> Optional[str]:
+    """
+    Rotate a page by -angle into "<name>_deskewed.jpg" next to the original.
+    The original is left untouched (it may be a hardlink into the object store).
+    Returns the new path, or None when no correction is needed.
+    """
+    if abs(angle) < MIN_DESKEW_ANGLE or abs(angle) > QUALITY_MAX_SKEW:
+        return None
+    img = cv2.imread(image_path)
+    if img is None:
+        return None
+    h, w = img.shape[:2]
+    rotation = cv2.getRotationMatrix2D((w / 2, h / 2), -angle, 1.0)
+    rotated = cv2.warpAffine(img, rotation, (w, h), flags=cv2.INTER_LINEAR,
+                             borderMode=cv2.BORDER_CONSTANT, borderValue=(255, 255, 255))
+    source = Path(image_path)
+    target = source.with_name(f"{source.stem}_deskewed.jpg")
+    cv2.imwrite(str(target), rotated, [cv2.IMWRITE_JPEG_QUALITY, 92])
+    return str(target)
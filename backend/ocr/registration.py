@@ -0,0 +1,177 @@
+"""
+Registration of page photos onto a template's reference image.
+
+ROI extraction reads fixed normalized regions, which only line up if the page
+has the same geometry as the template. Phone photos are shifted, rotated and
+skewed, so each page is warped onto its template reference with ORB keypoints
+and a RANSAC homography before regions are cropped.
+
+Reference keypoints/descriptors are computed once per template and cached in
+memory and on disk (REGISTRATION_CACHE_DIR), keyed by the reference file's
+size and mtime, so per-page cost is one ORB pass on a downscaled copy plus
+matching. Only the field crops are warped (see warp_region), never the
+whole page.
+"""
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config import BASE_DIR, REGISTRATION_CACHE_DIR, REGISTRATION_MAX_EDGE
+from .templates import get_template
+
+logger = logging.getLogger(__name__)
+
+ORB_FEATURES = 1500
+RATIO_TEST = 0.75
+MIN_INLIERS = 25
+RANSAC_REPROJ_THRESHOLD = 5.0
+
+_orb = None
+_matcher = None
+_references: Dict[str, dict] = {}
+_lock = threading.Lock()
+
+
+def _get_orb():
+    global _orb, _matcher
+    if _orb is None:
+        _orb = cv2.ORB_create(nfeatures=ORB_FEATURES)
+        _matcher = cv2.BFMatcher(cv2.NORM_HAMMING)
+    return _orb, _matcher
+
+
+def _downscale(gray) -> Tuple[np.ndarray, float]:
+    """Shrink to REGISTRATION_MAX_EDGE on the long side; returns (image, scale)"""
+    h, w = gray.shape[:2]
+    scale = min(1.0, REGISTRATION_MAX_EDGE / float(max(h, w)))
+    if scale < 1.0:
+        gray = cv2.resize(gray, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_LINEAR)
+    return gray, scale
+
+
+def _detect(img) -> Tuple[np.ndarray, Optional[np.ndarray], float]:
+    gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    small, scale = _downscale(gray)
+    orb, _ = _get_orb()
+    keypoints, descriptors = orb.detectAndCompute(small, None)
+    points = np.float32([kp.pt for kp in keypoints]) if keypoints else np.empty((0, 2), np.float32)
+    return points, descriptors, scale
+
+
+def reference_path(form_type: str) -> Optional[Path]:
+    """Reference image declared by the template, resolved against the repo root"""
+    ref = get_template(form_type).get("reference_image")
+    if not ref:
+        return None
+    path = Path(ref)
+    if not path.is_absolute():
+        path = BASE_DIR.parent / path
+    return path if path.exists() else None
+
+
+def _load_reference(form_type: str) -> Optional[dict]:
+    """Reference features from memory, then disk cache, computing them if needed"""
+    path = reference_path(form_type)
+    if path is None:
+        return None
+
+    stat = path.stat()
+    cache_key = f"{form_type}_{stat.st_size}_{int(stat.st_mtime)}_{REGISTRATION_MAX_EDGE}"
+    with _lock:
+        cached = _references.get(form_type)
+        if cached and cached["key"] == cache_key:
+            return cached
+
+        cache_file = REGISTRATION_CACHE_DIR / f"{cache_key}.npz"
+        if cache_file.exists():
+            stored = np.load(cache_file)
+            reference = {
+                "key": cache_key,
+                "points": stored["points"],
+                "descriptors": stored["descriptors"],
+                "scale": float(stored["scale"]),
+                "size": tuple(int(v) for v in stored["size"]),
+            }
+        else:
+            img = cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
+            if img is None:
+                logger.warning("Cannot read reference image %s for %s", path, form_type)
+                return None
+            points, descriptors, scale = _detect(img)
+            if descriptors is None:
+                logger.warning("No keypoints found in reference image %s", path)
+                return None
+            reference = {
+                "key": cache_key,
+                "points": points,
+                "descriptors": descriptors,
+                "scale": scale,
+                "size": (img.shape[1], img.shape[0]),
+            }
+            np.savez(cache_file, points=points, descriptors=descriptors,
+                     scale=scale, size=np.array(reference["size"]))
+            logger.info("Cached %d reference keypoints for %s", len(points), form_type)
+
+        _references[form_type] = reference
+        return reference
+
+
+def register_to_template(img, form_type: str) -> Optional[Tuple[np.ndarray, Tuple[int, int]]]:
+    """
+    Estimate the homography mapping a page onto the template reference.
+    Returns (homography, reference (width, height)), or None when the
+    template has no reference or the page could not be aligned reliably.
+    """
+    reference = _load_reference(form_type)
+    if reference is None:
+        return None
+
+    points, descriptors, scale = _detect(img)
+    if descriptors is None or len(points) < MIN_INLIERS:
+        logger.warning("Registration failed for %s: too few keypoints", form_type)
+        return None
+
+    _, matcher = _get_orb()
+    pairs = matcher.knnMatch(descriptors, reference["descriptors"], k=2)
+    good = [p[0] for p in pairs if len(p) == 2 and p[0].distance < RATIO_TEST * p[1].distance]
+    if len(good) < MIN_INLIERS:
+        logger.warning("Registration failed for %s: %d good matches", form_type, len(good))
+        return None
+
+    src = points[[m.queryIdx for m in good]].reshape(-1, 1, 2)
+    dst = reference["points"][[m.trainIdx for m in good]].reshape(-1, 1, 2)
+    homography, mask = cv2.findHomography(src, dst, cv2.RANSAC, RANSAC_REPROJ_THRESHOLD)
+    inliers = int(mask.sum()) if mask is not None else 0
+    if homography is None or inliers < MIN_INLIERS:
+        logger.warning("Registration failed for %s: %d inliers", form_type, inliers)
+        return None
+
+    # Homography was estimated on downscaled copies; lift it to full resolution
+    to_small = np.diag([scale, scale, 1.0])
+    from_ref_small = np.diag([1.0 / reference["scale"], 1.0 / reference["scale"], 1.0])
+    full = from_ref_small @ homography @ to_small
+
+    # Reject degenerate warps (mirroring, collapse or extreme scaling)
+    det = np.linalg.det(full[:2, :2])
+    if not 0.1 < det < 10:
+        logger.warning("Registration rejected for %s: degenerate homography (det=%.3f)", form_type, det)
+        return None
+
+    logger.info("Registered page onto %s reference (%d/%d inliers)", form_type, inliers, len(good))
+    return full, reference["size"]
+
+
+def warp_region(img, homography: np.ndarray, box) -> np.ndarray:
+    """
+    Crop [x0, y0, x1, y1] (reference pixel coordinates) out of the page,
+    warping only that region through the page-to-reference homography.
+    """
+    x0, y0, x1, y1 = box
+    shift = np.array([[1.0, 0.0, -x0], [0.0, 1.0, -y0], [0.0, 0.0, 1.0]])
+    return cv2.warpPerspective(img, shift @ homography, (max(1, x1 - x0), max(1, y1 - y0)),
+                               flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT,
+                               borderValue=(255, 255, 255))
@@ -1,88 +1,243 @@
 """
 Form templates define the structure and fields to extract from different form types.
+
+Templates are declared as JSON files in TEMPLATE_DIR (ocr/forms by default), one
+file per form, and compiled once into immutable CompiledTemplate objects. The
+registry re-reads the directory when a file is added, changed or removed, so a
+new form needs no code change. Compiled templates still support read-only dict
+access (template["fields"], template.get("gpt_prompt")).
+
+File format:
+- "form_types": names the template is registered under (aliases share one template)
+- "form_name", "gpt_prompt", "fields": [{"key", "label", "type", ...}]
+- "section" (optional, per field): Markdown export section; otherwise derived
+  from keywords in the key/label
+
+Fields may declare a "region" [x0, y0, x1, y1] in page coordinates normalized to
+0-1, covering where the handwritten value sits on the printed form. Templates with
+regions can be read in ROI mode (OCR_EXTRACTION_MODE=roi), which recognizes only
+those crops instead of running full layout analysis. "multiline": true runs text
+detection inside the region; table fields add "rows" (equal-height rows inside
+the region) and "columns" ({column key: [x0, x1]}) to read a fixed grid.
+
+"reference_image" (relative to the repo root) is the scan the regions were
+measured on; pages are registered onto it before ROI extraction.
+"confidence_threshold" is the per-field confidence below which the extraction
+cascade escalates to the next tier.
 """
+import json
+import logging
+import threading
+import time
+from collections.abc import Mapping
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, List, Tuple
+
+from config import TEMPLATE_DIR, TEMPLATE_RELOAD_SECONDS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FORM_TYPE = "GCCF_10K_P1"
+
+# Markdown export sections, matched in order against each field's key/label
+SECTION_RULES = (
+    ("申請人基本資料", ("申請人", "姓名", "身份證", "出生", "電話", "住址", "聯絡"), False),
+    ("就業資料", ("employ", "occupation", "income", "salary", "就業", "職業", "收入"), True),
+    ("家庭資料", ("family", "member", "marital", "家庭", "婚姻"), True),
+    ("財務資料", ("rent", "asset", "debt", "financial", "租金", "資產", "負債"), True),
+    ("申請資料", ("application", "amount", "purpose", "date", "申請", "金額", "目的", "日期"), True),
+)
+OTHER_SECTION = "其他資料"
+
+
+def _freeze(value):
+    """Recursively convert JSON values into read-only equivalents"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _section_for(field) -> str:
+    if field.get("section"):
+        return field["section"]
+    key, label = field["key"], field["label"]
+    for name, keywords, match_key in SECTION_RULES:
+        if any(kw in label or (match_key and kw in key) for kw in keywords):
+            return name
+    return OTHER_SECTION
+
+
+class CompiledTemplate(Mapping):
+    """
+    Immutable, precompiled form template.
+
+    field_keys / labels / header_labels: field keys, {key: label} and labels in field order
+    sections: ((section name, fields), ...) for the Markdown export
+    regions: fields that declare a region (ROI extraction)
+    matchers: ((key, keywords), ...) used to spot a field's label in OCR lines
+    """
+
+    __slots__ = (
+        "form_types", "form_name", "gpt_prompt", "reference_image", "confidence_threshold",
+        "fields", "field_keys", "labels", "header_labels", "sections", "regions", "matchers", "_raw",
+    )
+
+    def __init__(self, spec: Dict[str, Any]):
+        fields = _freeze(spec["fields"])
+        for field in fields:
+            if "key" not in field or "label" not in field:
+                raise ValueError(f"Template field needs 'key' and 'label': {dict(field)}")
+
+        sections: Dict[str, List] = {}
+        for field in fields:
+            sections.setdefault(_section_for(field), []).append(field)
+        # Keep the rule order (custom sections after the built-in ones, "other" last)
+        order = [name for name, _, _ in SECTION_RULES]
+        ordered = sorted(sections, key=lambda s: (s == OTHER_SECTION, order.index(s) if s in order else len(order)))
+
+        values = {
+            "form_types": tuple(spec["form_types"]),
+            "form_name": spec.get("form_name", spec["form_types"][0]),
+            "gpt_prompt": spec.get("gpt_prompt"),
+            "reference_image": spec.get("reference_image"),
+            "confidence_threshold": spec.get("confidence_threshold"),
+            "fields": fields,
+            "field_keys": tuple(field["key"] for field in fields),
+            "labels": MappingProxyType({field["key"]: field["label"] for field in fields}),
+            "header_labels": tuple(field["label"] for field in fields),
+            "sections": tuple((name, tuple(sections[name])) for name in ordered),
+            "regions": tuple(field for field in fields if field.get("region")),
+            "matchers": tuple(
+                (field["key"], (field["label"], field["key"], field["label"].replace("申請人", "")))
+                for field in fields
+            ),
+            "_raw": MappingProxyType({
+                k: fields if k == "fields" else _freeze(v) for k, v in spec.items() if k != "form_types"
+            }),
+        }
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CompiledTemplate is immutable")
+
+    # Read-only dict access to the declared attributes, for existing callers
+    def __getitem__(self, name):
+        return self._raw[name]
 
-# GCCF 10K Application Form - Page 1
-GCCF_10K_P1_TEMPLATE = {
-    "form_name": "GCCF 10K Application Form (Page 1)",
-    "fields": [
-        # Header
-        {"key": "header_district", "label": "區", "type": "text"},
-        {"key": "header_number", "label": "編號", "type": "text"},
-        {"key": "header_date", "label": "日期", "type": "text"},
-        # Applicant
-        {"key": "applicant_name_en", "label": "英文姓名", "type": "text"},
-        {"key": "applicant_name_zh", "label": "中文姓名", "type": "text"},
-        {"key": "applicant_sex", "label": "性別", "type": "text"},
-        {"key": "applicant_age", "label": "年齡", "type": "text"},
-        {"key": "applicant_hkid", "label": "香港身分證號碼", "type": "text"},
-        {"key": "applicant_race_chinese", "label": "族裔", "type": "text"},
-        {"key": "applicant_tel", "label": "電話", "type": "text"},
-        # Employment
-        {"key": "employment_post", "label": "職位", "type": "text"},
-        {"key": "employment_monthly_salary", "label": "月薪", "type": "text"},
-        {"key": "employment_other_income", "label": "其他入息", "type": "text"},
-        {"key": "employment_unemployed_reason", "label": "如並無就業", "type": "text"},
-        # Address
-        {"key": "address_detail", "label": "住址", "type": "text"},
-        {"key": "address_monthly_rental", "label": "月租", "type": "text"},
-        # Family members table anchor
-        {"key": "family_table", "label": "申請人家屬", "type": "table"},
-        {"key": "family_bottom_question", "label": "是否曾向華人慈善基金申請", "type": "text"},
-    ],
-    "gpt_prompt": """你是一個專業的香港表格識別助手。這是GCCF 10K申請表第1頁，請提取頭部、申請人資料、現職、住址、家屬表格中的資料，並以提供的key返回JSON。"""
-}
-
-# GCCF 10K Application Form - Page 2
-GCCF_10K_P2_TEMPLATE = {
-    "form_name": "GCCF 10K Application Form (Page 2)",
-    "fields": [
-        {"key": "incident_description", "label": "申請援助金的事故及理由", "type": "text"},
-        {"key": "amount_applied", "label": "申請金額", "type": "text"},
-        {"key": "signature_applicant", "label": "申請人簽署", "type": "text"},
-        {"key": "date_applicant", "label": "日期", "type": "text"},
-        {"key": "signature_officer", "label": "調查人員簽署", "type": "text"},
-        {"key": "name_officer", "label": "姓名", "type": "text"},
-        {"key": "post_officer", "label": "職位", "type": "text"},
-        {"key": "date_officer", "label": "日期", "type": "text"},
-    ],
-    "gpt_prompt": """你是一個專業的香港表格識別助手。這是GCCF 10K申請表第2頁，請提取事故描述、申請金額以及簽署區域的欄位。"""
-}
-
-# Estate Roster / Management Book (A01)
-ROSTER_TEMPLATE = {
-    "form_name": "Estate Owner Roster",
-    "fields": [
-        {"key": "roster_rows", "label": "單位", "type": "table"},  # expect a list of rows with unit, owner_name, home_phone, office_phone, mobile_phone
-        {"key": "roster_footer_note", "label": "聯絡電話", "type": "text"},
-    ],
-    "gpt_prompt": """這是一張住戶/業主任名冊（A01）。請輸出JSON：
-{
-  "data": {
-    "roster_rows": [
-      {"unit": "A101", "owner_name": "...", "home_phone": "...", "office_phone": "...", "mobile_phone": "..."},
-      ...
-    ],
-    "roster_footer_note": "..."
-  },
-  "confidence": { "roster_rows": 0.6, "roster_footer_note": 0.5 }
-}
-單位號碼請根據影像內的預印或手寫內容識別，不要預填。若某欄空白請用 null。"""
-}
+    def __iter__(self):
+        return iter(self._raw)
+
+    def __len__(self):
+        return len(self._raw)
+
+    def __repr__(self):
+        return f"<CompiledTemplate {'/'.join(self.form_types)}: {len(self.fields)} fields>"
+
+
+class TemplateRegistry:
+    """Compiled templates loaded from a directory, reloaded when its files change"""
+
+    def __init__(self, directory: Path, reload_seconds: float = TEMPLATE_RELOAD_SECONDS):
+        self.directory = Path(directory)
+        self.reload_seconds = reload_seconds
+        self._lock = threading.Lock()
+        self._templates: Dict[str, CompiledTemplate] = {}
+        self._signature = None
+        self._checked_at = 0.0
+        self._load(strict=True)
+
+    def get(self, form_type: str, default=None):
+        self._maybe_reload()
+        return self._templates.get(form_type, default)
+
+    def all(self) -> Dict[str, CompiledTemplate]:
+        self._maybe_reload()
+        return self._templates
+
+    def _scan(self) -> Tuple:
+        """Cheap change signature of the template files (name, mtime, size)"""
+        entries = []
+        for path in self.directory.glob("*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue  # Removed while scanning
+            entries.append((path.name, stat.st_mtime_ns, stat.st_size))
+        return tuple(sorted(entries))
+
+    def _maybe_reload(self):
+        if self.reload_seconds <= 0:
+            return
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_seconds:
+            return
+        with self._lock:
+            if now - self._checked_at < self.reload_seconds:
+                return
+            self._checked_at = now
+            if self._scan() != self._signature:
+                self._load(strict=False)
+
+    def _load(self, strict: bool):
+        signature = self._scan()
+        templates = {}
+        try:
+            for path in sorted(self.directory.glob("*.json")):
+                with open(path, encoding="utf-8") as f:
+                    template = CompiledTemplate(json.load(f))
+                for form_type in template.form_types:
+                    if form_type in templates:
+                        raise ValueError(f"{path.name}: form type {form_type} is already defined")
+                    templates[form_type] = template
+            if DEFAULT_FORM_TYPE not in templates:
+                raise ValueError(f"Default template {DEFAULT_FORM_TYPE} is missing")
+        except Exception:
+            if strict:
+                raise
+            # Keep serving the last good templates until the files are fixed
+            logger.exception("Failed to reload templates from %s", self.directory)
+            self._signature = signature
+            return
+        # Swap in one assignment so readers never see a partial registry
+        self._templates = templates
+        self._signature = signature
+        logger.info("Loaded %d form templates from %s", len(set(map(id, templates.values()))), self.directory)
+
+
+class _TemplateMapping(Mapping):
+    """Live {form_type: template} view of the registry"""
+
+    def __getitem__(self, form_type):
+        return registry.all()[form_type]
+
+    def __iter__(self):
+        return iter(registry.all())
+
+    def __len__(self):
+        return len(registry.all())
+
+    def __contains__(self, form_type):
+        return form_type in registry.all()
+
+
+registry = TemplateRegistry(TEMPLATE_DIR)
 
 # Template registry
-FORM_TEMPLATES = {
-    "GCCF_10K_P1": GCCF_10K_P1_TEMPLATE,
-    "GCCF_10K_P2": GCCF_10K_P2_TEMPLATE,
-    "MGT_BOOK": ROSTER_TEMPLATE,
-    "HOUSE_ROSTER": ROSTER_TEMPLATE,
-}
-
-def get_template(form_type: str):
+FORM_TEMPLATES = _TemplateMapping()
+
+def get_template(form_type: str) -> CompiledTemplate:
     """Get form template by type"""
-    return FORM_TEMPLATES.get(form_type, GCCF_10K_P1_TEMPLATE)
+    template = registry.get(form_type)
+    return template if template is not None else registry.get(DEFAULT_FORM_TYPE)
 
 def get_field_labels(form_type: str):
     """Get field labels for display"""
-    template = get_template(form_type)
-    return {field["key"]: field["label"] for field in template["fields"]}
+    return get_template(form_type).labels
+
+def get_field_regions(form_type: str):
+    """Get fields that declare a normalized region, for ROI extraction"""
+    return get_template(form_type).regions
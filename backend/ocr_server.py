@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Local OCR inference server
+
+Owns the only copy of the OCR models and serves pages to RQ workers, the API
+and batch_ocr.py (OCR_BACKEND=server). Concurrent requests are micro-batched:
+the first waiting page opens a window of OCR_SERVER_MAX_WAIT_MS, pages arriving
+inside it (up to OCR_SERVER_MAX_BATCH) run through process_documents together,
+which pools text recognition across callers in groups of OCR_BATCH_PAGES (and
+keeps them on the per-page path while it is 1). Pages that arrive while a
+batch is running form the next one.
+
+Usage:
+    python ocr_server.py [--host 127.0.0.1] [--port 8866]
+    python ocr_server.py --uds /run/ocr/ocr.sock
+
+Clients read paths from the same filesystem, so run it on the worker host.
+"""
+import argparse
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+from config import OCR_SERVER_MAX_BATCH, OCR_SERVER_MAX_WAIT_MS
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("ocr_server")
+
+
+class ProcessRequest(BaseModel):
+    paths: List[str]
+    form_type: str = "AUTO"
+
+
+def _jsonable(value):
+    """Convert numpy values in OCR results to JSON builtins"""
+    if isinstance(value, dict):
+        return {k: _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class MicroBatcher:
+    """Collects pages from concurrent requests into OCR batches"""
+
+    def __init__(self, processor, max_batch: int, max_wait_ms: float):
+        self.processor = processor
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.queue: Optional[asyncio.Queue] = None
+        # One inference at a time; the event loop keeps accepting requests meanwhile
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ocr")
+        self.batches = 0
+        self.pages = 0
+        self.busy_seconds = 0.0
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        return asyncio.create_task(self._run())
+
+    async def submit(self, paths: List[str], form_type: str) -> List[Any]:
+        loop = asyncio.get_running_loop()
+        futures = []
+        for path in paths:
+            future = loop.create_future()
+            await self.queue.put((path, form_type, future))
+            futures.append(future)
+        return await asyncio.gather(*futures)
+
+    async def _collect(self) -> list:
+        """First waiting page, plus whatever arrives before the deadline"""
+        loop = asyncio.get_running_loop()
+        items = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(items) < self.max_batch:
+            try:
+                items.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                items.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return items
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = await self._collect()
+            # process_documents takes one form type per call
+            groups = {}
+            for item in items:
+                groups.setdefault(item[1], []).append(item)
+            for form_type, group in groups.items():
+                paths = [path for path, _, _ in group]
+                start = time.perf_counter()
+                try:
+                    results = await loop.run_in_executor(
+                        self.executor, self.processor.process_documents, paths, form_type
+                    )
+                except Exception as exc:
+                    logger.exception("OCR failed for a batch of %d pages", len(paths))
+                    results = [exc]
+                    if len(paths) > 1:
+                        # The batch mixes clients: isolate the failing page instead of failing them all
+                        results = [
+                            await loop.run_in_executor(self.executor, self._process_one, path, form_type)
+                            for path in paths
+                        ]
+                elapsed = time.perf_counter() - start
+                self.batches += 1
+                self.pages += len(paths)
+                self.busy_seconds += elapsed
+                logger.info("OCR batch: %d pages (%s) in %.2fs", len(paths), form_type, elapsed)
+                for (_, _, future), result in zip(group, results):
+                    if not future.done():
+                        future.set_result(result)
+
+    def _process_one(self, path: str, form_type: str):
+        """process_documents for a single page; returns its result or the exception"""
+        try:
+            return self.processor.process_documents([path], form_type)[0]
+        except Exception as exc:
+            logger.exception("OCR failed for %s", path)
+            return exc
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "pages": self.pages,
+            "avg_batch_pages": round(self.pages / self.batches, 2) if self.batches else 0,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "queued_pages": self.queue.qsize() if self.queue else 0,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+
+def create_app(max_batch: int = OCR_SERVER_MAX_BATCH, max_wait_ms: float = OCR_SERVER_MAX_WAIT_MS) -> FastAPI:
+    app = FastAPI(title="OCR inference server")
+    state = {}
+
+    @app.on_event("startup")
+    async def startup():
+        from ocr.processor import get_processor
+        # Load the models once, before accepting requests
+        processor = get_processor()
+        batcher = MicroBatcher(processor, max_batch, max_wait_ms)
+        state["batcher"] = batcher
+        state["task"] = batcher.start()
+
+    @app.on_event("shutdown")
+    async def shutdown():
+        state["task"].cancel()
+        state["batcher"].executor.shutdown(wait=False)
+
+    @app.post("/process")
+    async def process(request: ProcessRequest):
+        results = await state["batcher"].submit(request.paths, request.form_type)
+        items = []
+        for result in results:
+            if isinstance(result, Exception):
+                items.append({"error": f"{type(result).__name__}: {result}"})
+            else:
+                items.append({"result": _jsonable(result)})
+        return {"results": items}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok", **state["batcher"].stats()}
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve OCR inference to workers over local HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8866)
+    parser.add_argument("--uds", help="Listen on a Unix domain socket instead of TCP")
+    parser.add_argument("--max-batch", type=int, default=OCR_SERVER_MAX_BATCH,
+                        help="Max pages per inference batch")
+    parser.add_argument("--max-wait-ms", type=float, default=OCR_SERVER_MAX_WAIT_MS,
+                        help="How long the first queued page waits for others to join its batch")
+    args = parser.parse_args()
+
+    print("🚀 OCR inference server starting (models load before the first request)...")
+    print(f"📡 Listening on {'unix:' + args.uds if args.uds else f'http://{args.host}:{args.port}'}")
+    print(f"📦 Micro-batching: up to {args.max_batch} pages, {args.max_wait_ms:g} ms window")
+
+    uvicorn.run(create_app(args.max_batch, args.max_wait_ms), host=args.host, port=args.port, uds=args.uds)
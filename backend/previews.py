@@ -0,0 +1,70 @@
+"""
+Resized preview derivatives of uploaded page images.
+
+Previews are generated lazily on first request at a few fixed sizes, cached on
+disk under PREVIEW_DIR and evicted least-recently-used once the cache grows
+beyond PREVIEW_CACHE_MAX_BYTES. Derivatives are keyed by the image content hash,
+so duplicate uploads share the same previews.
+"""
+import os
+import tempfile
+from pathlib import Path
+
+from PIL import Image as PILImage, ImageOps
+
+from config import PREVIEW_DIR, PREVIEW_CACHE_MAX_BYTES
+from disk_cache import LRUDiskCache
+
+# Longest edge in pixels for each preview size
+PREVIEW_SIZES = {
+    "thumb": 160,
+    "medium": 800,
+    "large": 1600,
+}
+
+PREVIEW_FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+}
+
+_cache = LRUDiskCache(PREVIEW_DIR, PREVIEW_CACHE_MAX_BYTES, "previews")
+
+
+def preview_key(source_key: str, size: str, fmt: str) -> str:
+    """Cache key (and ETag value) of a derivative"""
+    return f"{source_key}_{size}.{fmt}"
+
+
+def get_preview(source_path: str, source_key: str, size: str, fmt: str) -> Path:
+    """
+    Return the cached derivative for source_path, generating it if needed.
+    source_key must change whenever the source bytes change (content hash).
+    """
+    target = PREVIEW_DIR / source_key[:2] / preview_key(source_key, size, fmt)
+    # Refresh mtime so eviction treats it as recently used; gone since the check means a miss
+    if target.exists() and _cache.touch(target):
+        return target
+
+    _render_preview(Path(source_path), target, PREVIEW_SIZES[size], PREVIEW_FORMATS[fmt][0])
+    _cache.account(target.stat().st_size)
+    return target
+
+
+def _render_preview(source: Path, target: Path, max_edge: int, pil_format: str):
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with PILImage.open(source) as img:
+        # Let the JPEG decoder downscale while decoding instead of decoding full resolution
+        img.draft("RGB", (max_edge, max_edge))
+        img = ImageOps.exif_transpose(img)
+        img = img.convert("RGB")
+        img.thumbnail((max_edge, max_edge), PILImage.LANCZOS)
+
+        fd, tmp_name = tempfile.mkstemp(dir=target.parent)
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                img.save(tmp, format=pil_format, quality=80)
+            os.replace(tmp_name, target)
+        finally:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+
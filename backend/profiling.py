@@ -0,0 +1,202 @@
+"""
+Opt-in profiling of API requests and OCR jobs.
+
+A request is profiled when its X-Profile header equals PROFILING_TOKEN;
+uploads and retries sent with the header also flag their RQ job
+(job.meta["profile"]), so the worker profiles process_batch. Profiling is off
+unless PROFILING_ENABLED is set and PROFILING_TOKEN is non-empty.
+
+The profiler samples the stacks of every thread in the process every
+PROFILE_SAMPLE_MS, so work done in the OCR pipeline stage threads and in
+FastAPI's threadpool is included (cProfile only sees the calling thread).
+Each profile is written to PROFILE_DIR as:
+- <name>.folded: collapsed stacks ("thread;outer;...;inner count"), loadable in
+  speedscope or flamegraph.pl
+- <name>.txt: top functions by own and total samples, idle waits excluded
+- <name>.json: kind, label, start time, duration and sample count
+"""
+import hmac
+import json
+import logging
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import PROFILE_DIR, PROFILING_ENABLED, PROFILING_TOKEN, PROFILE_SAMPLE_MS, PROFILE_KEEP
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile"
+ARTIFACT_FORMATS = ("folded", "txt", "json")
+SUMMARY_TOP = 40
+# Leaf frames in these files are threads blocked waiting, not doing work
+IDLE_FILES = ("threading.py", "queue.py", "selectors.py", "socket.py", "ssl.py")
+
+
+def profiling_active() -> bool:
+    """Profiling is only on with both PROFILING_ENABLED and a PROFILING_TOKEN"""
+    return PROFILING_ENABLED and bool(PROFILING_TOKEN)
+
+
+def profiling_requested(header_value: Optional[str]) -> bool:
+    """Whether a request's X-Profile header carries the profiling token"""
+    if not profiling_active() or not header_value:
+        return False
+    return hmac.compare_digest(header_value.encode(), PROFILING_TOKEN.encode())
+
+
+if PROFILING_ENABLED and not PROFILING_TOKEN:
+    logger.warning("PROFILING_ENABLED is set but PROFILING_TOKEN is empty; profiling stays off")
+
+
+class StackSampler:
+    """Periodically samples the Python stacks of all other threads"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def summary(self) -> str:
+        """Top functions by own (leaf) and total (anywhere on the stack) samples"""
+        own, total = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")[1:]
+            if not frames or frames[-1].split(":")[0].endswith(IDLE_FILES):
+                continue
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        busy = sum(own.values()) or 1
+        lines = [f"{self.samples} samples every {self.interval * 1000:g} ms, {busy} busy thread samples", ""]
+        for title, counter in (("Own samples", own), ("Total samples", total)):
+            lines.append(f"{title}:")
+            for frame, count in counter.most_common(SUMMARY_TOP):
+                lines.append(f"{count:8d} {100 * count / busy:6.1f}%  {frame}")
+            lines.append("")
+        return "\n".join(lines)
+
+
+class Profile:
+    """One profile: sample all threads between start() and stop(), then save()"""
+
+    def __init__(self, kind: str, label: str):
+        self.kind = kind
+        self.label = label
+        slug = re.sub(r"[^A-Za-z0-9_-]+", "-", label).strip("-")[:60]
+        # Timestamp first so names sort chronologically
+        self.name = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}_{kind}_{slug}"
+        self.sampler = StackSampler(PROFILE_SAMPLE_MS / 1000)
+        self.started_at = None
+        self.duration = 0.0
+        self._started = 0.0
+
+    def start(self):
+        self.started_at = datetime.now()
+        self._started = time.monotonic()
+        self.sampler.start()
+
+    def stop(self):
+        self.sampler.stop()
+        self.duration = time.monotonic() - self._started
+
+    def save(self):
+        """Write the artifacts to PROFILE_DIR (blocking file I/O)"""
+        try:
+            _write(self, self.sampler, self.started_at, self.duration)
+        except OSError:
+            logger.exception("Failed to write profile %s", self.name)
+
+
+@contextmanager
+def profile(kind: str, label: str):
+    """Sample all threads while the block runs and write the artifacts to PROFILE_DIR"""
+    handle = Profile(kind, label)
+    handle.start()
+    try:
+        yield handle
+    finally:
+        handle.stop()
+        handle.save()
+
+
+def _write(handle: Profile, sampler: StackSampler, started_at: datetime, duration: float):
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    (PROFILE_DIR / f"{handle.name}.folded").write_text(
+        "".join(f"{stack} {count}\n" for stack, count in sampler.stacks.most_common()), encoding="utf-8"
+    )
+    (PROFILE_DIR / f"{handle.name}.txt").write_text(
+        f"{handle.kind} {handle.label} ({duration:.2f}s)\n{sampler.summary()}", encoding="utf-8"
+    )
+    (PROFILE_DIR / f"{handle.name}.json").write_text(json.dumps({
+        "name": handle.name,
+        "kind": handle.kind,
+        "label": handle.label,
+        "started_at": started_at.isoformat(),
+        "duration_seconds": round(duration, 3),
+        "samples": sampler.samples,
+        "interval_ms": PROFILE_SAMPLE_MS,
+    }), encoding="utf-8")
+    logger.info("Wrote profile %s (%.2fs, %d samples)", handle.name, duration, sampler.samples)
+    _prune()
+
+
+def _prune():
+    """Keep only the newest PROFILE_KEEP profiles"""
+    metas = sorted(PROFILE_DIR.glob("*.json"), key=lambda p: p.name, reverse=True)
+    for meta in metas[PROFILE_KEEP:]:
+        for fmt in ARTIFACT_FORMATS:
+            meta.with_suffix(f".{fmt}").unlink(missing_ok=True)
+
+
+def list_profiles(kind: Optional[str] = None) -> List[Dict]:
+    """Metadata of stored profiles, newest first"""
+    profiles = []
+    for path in sorted(PROFILE_DIR.glob("*.json"), key=lambda p: p.name, reverse=True):
+        try:
+            meta = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue  # Being written or pruned
+        if kind and meta.get("kind") != kind:
+            continue
+        profiles.append(meta)
+    return profiles
+
+
+def artifact_path(name: str, fmt: str) -> Optional[Path]:
+    """Path of a stored profile artifact, or None if it doesn't exist"""
+    if fmt not in ARTIFACT_FORMATS or not re.fullmatch(r"[A-Za-z0-9_-]+", name):
+        return None
+    path = PROFILE_DIR / f"{name}.{fmt}"
+    return path if path.is_file() else None
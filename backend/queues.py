@@ -0,0 +1,27 @@
+"""
+RQ queues used by the API and workers.
+
+Work is split into two priority lanes so interactive single-page uploads and
+bulk work never compete for the same worker slots:
+- interactive: single pages a user is waiting on; served by dedicated workers
+- bulk: multi-page batches and maintenance jobs (re-extraction etc.)
+"""
+from redis import Redis
+from rq import Queue
+
+from config import REDIS_URL
+
+INTERACTIVE_QUEUE = "interactive"
+BULK_QUEUE = "bulk"
+
+redis_conn = Redis.from_url(REDIS_URL)
+interactive_queue = Queue(INTERACTIVE_QUEUE, connection=redis_conn)
+bulk_queue = Queue(BULK_QUEUE, connection=redis_conn)
+
+# Queue names each worker lane listens on, in priority order
+WORKER_LANES = {
+    INTERACTIVE_QUEUE: [INTERACTIVE_QUEUE],
+    BULK_QUEUE: [BULK_QUEUE, "default"],
+    # Single worker for development: interactive first, then bulk
+    "all": [INTERACTIVE_QUEUE, BULK_QUEUE, "default"],
+}
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Bulk Re-extraction Script
+Re-run field extraction over stored OCR output after template or heuristic changes
+
+Usage:
+    python reextract.py [--form-type GCCF_10K_P1] [--from 2025-01-01] [--to 2025-01-31]
+                        [--chunk-size 500] [--processes 8]
+"""
+import argparse
+import logging
+from datetime import date
+
+from config import REEXTRACT_CHUNK_SIZE, REEXTRACT_PROCESSES
+from database import init_db
+from workers.reextract import reextract_results
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-extract fields from stored OCR results")
+    parser.add_argument("--form-type", default=None, help="Only re-extract results of this template")
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat, default=None,
+                        help="First batch creation date (YYYY-MM-DD, inclusive)")
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat, default=None,
+                        help="Last batch creation date (YYYY-MM-DD, inclusive)")
+    parser.add_argument("--chunk-size", type=int, default=REEXTRACT_CHUNK_SIZE)
+    parser.add_argument("--processes", type=int, default=REEXTRACT_PROCESSES)
+    args = parser.parse_args()
+
+    init_db()
+    stats = reextract_results(
+        form_type=args.form_type,
+        date_from=args.date_from,
+        date_to=args.date_to,
+        chunk_size=args.chunk_size,
+        processes=args.processes,
+    )
+
+    print(f"✅ Re-extracted {stats['updated']} of {stats['total']} results "
+          f"({stats['skipped']} skipped) in {stats['elapsed']}s ({stats['rows_per_sec']} rows/sec)")
@@ -10,6 +10,10 @@ class ImageResponse(BaseModel):
     ocr_data: Optional[Dict[str, Any]] = None
     confidence: Optional[Dict[str, float]] = None
     raw_text: Optional[str] = None
+    field_tiers: Optional[Dict[str, str]] = None  # Extraction tier per field (cascade mode)
+    quality: Optional[Dict[str, Any]] = None  # Triage metrics and verdict
+    attempts: int = 0
+    error_message: Optional[str] = None  # Last processing error for this page
     
     class Config:
         from_attributes = True
@@ -22,6 +26,7 @@ class BatchResponse(BaseModel):
     updated_at: datetime
     error_message: Optional[str] = None
     images: List[ImageResponse] = []
+    estimated_completion: Optional[datetime] = None  # Set on accepted uploads when throughput is known
     
     class Config:
         from_attributes = True
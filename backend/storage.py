@@ -0,0 +1,74 @@
+"""
+Content-addressable storage for uploaded images.
+
+Uploads are hashed while they stream to disk and stored once under
+OBJECT_STORE_DIR/<aa>/<bb>/<sha256>. The per-batch path
+(UPLOAD_DIR/<date>/<batch_id>/page_N.ext) is a hardlink to that object, so the
+existing /uploads URLs keep working while identical bytes are stored only once.
+"""
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import BinaryIO, Tuple
+
+from config import OBJECT_STORE_DIR
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def object_path(content_hash: str) -> Path:
+    """Location of a stored object for the given sha256 hex digest"""
+    return OBJECT_STORE_DIR / content_hash[:2] / content_hash[2:4] / content_hash
+
+
+def store_upload(source: BinaryIO, dest_path: Path) -> Tuple[str, int]:
+    """
+    Stream an upload into the object store and link it at dest_path.
+    Returns (sha256 hex digest, size in bytes).
+    """
+    tmp_dir = OBJECT_STORE_DIR / "tmp"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_name = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                size += len(chunk)
+                tmp.write(chunk)
+
+        content_hash = digest.hexdigest()
+        target = object_path(content_hash)
+        if target.exists():
+            logger.info("Upload %s already stored as %s", dest_path.name, content_hash)
+        else:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_name, target)
+    finally:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+
+    link_object(content_hash, dest_path)
+    return content_hash, size
+
+
+def link_object(content_hash: str, dest_path: Path):
+    """Hardlink a stored object to dest_path (copy when hardlinks are unsupported)"""
+    dest_path.parent.mkdir(parents=True, exist_ok=True)
+    if dest_path.exists():
+        dest_path.unlink()
+    try:
+        os.link(object_path(content_hash), dest_path)
+    except OSError:
+        # Different filesystem or no hardlink support
+        shutil.copyfile(object_path(content_hash), dest_path)
@@ -0,0 +1,15 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# config.py reads the environment at import: point storage at a scratch directory
+_tmp = Path(tempfile.mkdtemp(prefix="ocr-tests-"))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp / 'test.db'}")
+for name in ("UPLOAD_DIR", "EXPORT_DIR", "OBJECT_STORE_DIR", "PREVIEW_DIR", "PROFILE_DIR",
+             "LIFECYCLE_ARCHIVE_DIR", "REGISTRATION_CACHE_DIR"):
+    os.environ.setdefault(name, str(_tmp / name.lower()))
+# Nothing listens here, so Redis lookups fail fast and fall back
+os.environ.setdefault("REDIS_URL", "redis://127.0.0.1:1/0")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
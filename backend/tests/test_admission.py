@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import admission
+from database import SessionLocal, engine, init_db
+from models import Base, Batch, BatchStatus, Image, OcrResult
+
+
+@pytest.fixture
+def db():
+    init_db()
+    session = SessionLocal()
+    admission._throughput.update(at=0.0, value=None)
+    yield session
+    session.close()
+    Base.metadata.drop_all(bind=engine)
+
+
+def _batch(db, status, pages):
+    batch = Batch(status=status, form_type="GCCF_10K_P1")
+    db.add(batch)
+    db.flush()
+    images = [Image(batch_id=batch.id, file_path=f"/tmp/{batch.id}_{i}.jpg", page_index=i) for i in range(pages)]
+    db.add_all(images)
+    db.flush()
+    return images
+
+
+def _result(db, image, minutes_ago, processing_seconds):
+    db.add(OcrResult(
+        image_id=image.id,
+        data_json="{}",
+        processed_at=datetime.utcnow() - timedelta(minutes=minutes_ago),
+        processing_seconds=processing_seconds,
+    ))
+
+
+def test_light_load_is_admitted(db):
+    # 3 pages finished 14 minutes ago, then an idle system; a 10-page batch just finished its first page
+    for image in _batch(db, BatchStatus.DONE, 3):
+        _result(db, image, 14, 4.0)
+    running = _batch(db, BatchStatus.PROCESSING, 10)
+    _result(db, running[0], 0, 4.0)
+    db.commit()
+
+    decision = admission.check_admission(db, 10)
+
+    assert decision.admitted
+    assert decision.backlog_pages == 9
+    # Idle time between the batches doesn't lower the estimate: 4 pages in 16 s of work
+    assert decision.pages_per_sec == pytest.approx(0.25)
+    assert decision.eta_seconds == pytest.approx(76)
+
+
+def test_reused_results_are_not_counted(db):
+    images = _batch(db, BatchStatus.DONE, 4)
+    _result(db, images[0], 1, 2.0)
+    for image in images[1:]:
+        _result(db, image, 1, None)  # Copied from a duplicate upload
+    db.commit()
+
+    assert admission.estimate_throughput(db) == pytest.approx(0.5)
+
+
+def test_overloaded_backlog_is_rejected(db):
+    done = _batch(db, BatchStatus.DONE, 2)
+    for image in done:
+        _result(db, image, 1, 30.0)
+    _batch(db, BatchStatus.PENDING, 100)
+    db.commit()
+
+    decision = admission.check_admission(db, 10)
+
+    assert not decision.admitted
+    assert decision.retry_after > 0
@@ -0,0 +1,36 @@
+import cv2
+import numpy as np
+import pytest
+
+from ocr.quality import assess_image
+
+
+def _page(tmp_path, name, paper, ink, lines):
+    """A4-ish page at 4x the analysis size with a few lines of fake text"""
+    page = np.full((4000, 2800), paper, dtype=np.uint8)
+    for i in range(lines):
+        y = 400 + i * 160
+        cv2.putText(page, "Name 12345 Address Road", (300, y), cv2.FONT_HERSHEY_SIMPLEX, 3, int(ink), 8)
+    path = tmp_path / name
+    cv2.imwrite(str(path), page)
+    return str(path)
+
+
+def test_sparse_clean_page_is_not_overexposed(tmp_path):
+    quality = assess_image(_page(tmp_path, "sparse.jpg", paper=255, ink=0, lines=6))
+    assert quality["brightness"] > 250
+    assert quality["status"] != "rejected"
+    assert not {"overexposed", "low contrast", "dark page"} & set(quality["notes"])
+
+
+def test_washed_out_ink_is_flagged(tmp_path):
+    quality = assess_image(_page(tmp_path, "faint.jpg", paper=255, ink=230, lines=10))
+    assert "low contrast" in quality["notes"]
+    assert "overexposed" not in quality["notes"]
+
+
+@pytest.mark.parametrize("level, note", [(0, "underexposed"), (255, "overexposed")])
+def test_fully_clipped_page_is_rejected(tmp_path, level, note):
+    quality = assess_image(_page(tmp_path, f"clipped_{level}.jpg", paper=level, ink=level, lines=0))
+    assert quality["status"] == "rejected"
+    assert note in quality["notes"]
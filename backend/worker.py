@@ -4,13 +4,23 @@ RQ Worker Script
 Start this to process OCR jobs in the background
 
 Usage:
-    python worker.py
+    python worker.py [--lane interactive|bulk|all]
+
+Run at least one worker per lane in production so interactive single-page
+uploads have dedicated capacity and bulk batches are never starved:
+    python worker.py --lane interactive
+    python worker.py --lane bulk
 """
+import argparse
 import logging
-from redis import Redis
-from rq import Worker
+import os
+from rq import Queue, Worker
+from rq.registry import clean_registries
 
 from config import REDIS_URL
+from database import SessionLocal
+from queues import redis_conn, WORKER_LANES
+from workers.batch_processor import recover_stalled_batches
 
 # Configure logging
 logging.basicConfig(
@@ -19,14 +29,29 @@ logging.basicConfig(
 )
 
 if __name__ == "__main__":
-    # Create Redis connection
-    redis_conn = Redis.from_url(REDIS_URL)
+    parser = argparse.ArgumentParser(description="Start an RQ worker for OCR jobs")
+    parser.add_argument("--lane", choices=sorted(WORKER_LANES), default=os.getenv("WORKER_LANE", "all"),
+                        help="Priority lane to serve (default: all, interactive first)")
+    args = parser.parse_args()
+    queues = WORKER_LANES[args.lane]
+    
+    # Batches left behind by a killed worker: expire its abandoned jobs, then mark them as errors
+    for name in queues:
+        clean_registries(Queue(name, connection=redis_conn))
+    db = SessionLocal()
+    try:
+        stalled = recover_stalled_batches(db)
+    finally:
+        db.close()
+    if stalled:
+        print(f"⚠️  Marked {stalled} stalled batches as error (retry to resume)")
     
     # Create worker
-    worker = Worker(['default'], connection=redis_conn)
+    worker = Worker(queues, connection=redis_conn)
     
     print("🚀 RQ Worker started. Waiting for jobs...")
     print(f"📡 Connected to Redis: {REDIS_URL}")
+    print(f"📥 Lane: {args.lane} (queues: {', '.join(queues)})")
     print("Press Ctrl+C to stop")
     
     # Start processing jobs
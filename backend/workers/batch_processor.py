@@ -1,17 +1,57 @@
 import json
 import logging
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Iterable
+import cv2
+from redis.exceptions import RedisError
+from rq.job import Job
+from sqlalchemy import func, or_
 from sqlalchemy.orm import Session
 from models import Batch, Image, OcrResult, BatchStatus
 from database import SessionLocal
-from ocr.processor import get_processor
+from config import (
+    OCR_BACKEND, OCR_BATCH_PAGES, PIPELINE_QUEUE_SIZE, QUALITY_TRIAGE, IMAGE_MAX_ATTEMPTS,
+    BATCH_STALE_MINUTES
+)
+from queues import redis_conn
+from ocr import extraction
+from ocr.engine import get_processor
+from ocr.quality import assess_image, deskew_image
+from profiling import profile, profiling_active
+from workers.document_ingest import rasterize_documents
+from workers.memory import JobMemory, release_memory
+from workers.pipeline import Stage, StagePipeline
+from workers.reextract import REEXTRACT_METHODS
 
 logger = logging.getLogger(__name__)
 
-def process_batch(batch_id: str):
+def process_batch(batch_id: str, retry_failed: bool = False):
     """
     Process all images in a batch with OCR
     This runs as an async RQ job
+
+    Resumable: images that already have a result are skipped, so re-running
+    after an interrupted job only processes the remaining pages. Pages that
+    failed IMAGE_MAX_ATTEMPTS times are skipped unless retry_failed is set.
+
+    Peak RSS (and tracemalloc top allocations when enabled) is recorded in the
+    RQ job meta under "memory"; with JOB_MEMORY_LIMIT_MB set, oversized pages
+    are downscaled and the batch fails cleanly if the worker stays over it.
     """
+    memory = JobMemory()
+    try:
+        with memory, _job_profile(batch_id):
+            _process_batch(batch_id, retry_failed, memory)
+    finally:
+        report = memory.report()
+        # Return freed page buffers to the OS so long-running workers don't creep up
+        release_memory()
+        logger.info("Memory for batch %s: %s", batch_id, report)
+        _publish_job_meta("memory", report)
+
+def _process_batch(batch_id: str, retry_failed: bool, memory: JobMemory):
     db = SessionLocal()
     
     try:
@@ -25,6 +65,9 @@ def process_batch(batch_id: str):
         batch.status = BatchStatus.PROCESSING
         db.commit()
         
+        # Expand uploaded PDF/TIFF scans into page images
+        rasterize_documents(db, batch)
+        
         logger.info(f"Processing batch {batch_id} with {len(batch.images)} images")
         
         # Get OCR processor
@@ -33,16 +76,62 @@ def process_batch(batch_id: str):
         success_count = 0
         failures = []
         
-        # Process each image
+        # Reuse results for duplicate images; everything else needs OCR
+        pending = []
         for image in batch.images:
+            if image.ocr_result is not None:
+                # Checkpoint from an earlier (possibly interrupted) run
+                success_count += 1
+                continue
+            if not retry_failed and (image.attempts or 0) >= IMAGE_MAX_ATTEMPTS:
+                logger.warning("Skipping image %s after %d failed attempts", image.id, image.attempts)
+                failures.append(f"Image {image.page_index}: {image.error_message or 'failed'} (gave up after {image.attempts} attempts)")
+                continue
             try:
-                logger.info(f"Processing image {image.id}: {image.file_path}")
-                
-                # Run OCR end-to-end (returns dict with data/confidence/raw_text)
-                result = processor.process_document(
-                    image.file_path,
-                    batch.form_type
-                )
+                # Identical bytes already OCR'd for this form type: reuse the OCR output
+                reused = _find_reusable_result(db, image, batch.form_type)
+                if reused:
+                    db.add(_reuse_result(reused, image, batch.form_type))
+                    image.error_message = None
+                    db.commit()
+                    logger.info(f"Reused OCR result {reused.id} for duplicate image {image.id}")
+                    success_count += 1
+                else:
+                    pending.append(image)
+            except Exception as e:
+                logger.exception(f"Error processing image {image.id}: {e}")
+                failures.append(f"Image {image.page_index}: {e}")
+
+        # Decode/triage, OCR and persistence run as overlapping pipeline stages;
+        # only this thread touches the DB session
+        images_by_id = {image.id: image for image in pending}
+        pipeline = StagePipeline(
+            [
+                Stage("decode", lambda jobs: _decode_stage(jobs, memory, retry_failed)),
+                Stage("ocr", lambda jobs: _ocr_stage(processor, jobs, batch.form_type),
+                      batch_size=max(1, OCR_BATCH_PAGES)),
+            ],
+            queue_size=PIPELINE_QUEUE_SIZE,
+            sink_name="persist",
+        )
+        jobs = [{"image_id": image.id, "page_index": image.page_index, "file_path": image.file_path}
+                for image in pending]
+
+        # Service time per page: since the previous page was persisted (stages overlap,
+        # so this is the worker's busy time per page rather than the sum of the stages)
+        page_started = time.monotonic()
+        for done, job in enumerate(pipeline.run(jobs), start=1):
+            image = images_by_id[job["image_id"]]
+            try:
+                if "quality" in job:
+                    _apply_quality(image, job["quality"], job.get("ocr_path"))
+                    db.commit()
+                    if job["quality"]["status"] == "rejected":
+                        raise ValueError(f"rejected by quality triage ({image.quality_notes})")
+
+                result = job.get("result")
+                if isinstance(result, Exception):
+                    raise result
 
                 if not result or not result.get("raw_text"):
                     raise ValueError("OCR returned empty result")
@@ -52,19 +141,44 @@ def process_batch(batch_id: str):
                     image_id=image.id,
                     data_json=json.dumps(result.get("data", {}), ensure_ascii=False),
                     confidence_json=json.dumps(result.get("confidence", {}), ensure_ascii=False),
-                    raw_text=result.get("raw_text", "")
+                    raw_text=result.get("raw_text", ""),
+                    ocr_lines_json=json.dumps(result.get("lines", []), ensure_ascii=False),
+                    form_type=result.get("form_type"),
+                    method=result.get("method"),
+                    field_tiers_json=json.dumps(result["field_tiers"], ensure_ascii=False) if result.get("field_tiers") else None,
+                    processing_seconds=round(time.monotonic() - page_started, 3)
                 )
                 db.add(ocr_result)
+                image.error_message = None
+                batch.updated_at = datetime.utcnow()  # Heartbeat for reset_stalled_batches
                 db.commit()
                 
                 logger.info(f"Successfully processed image {image.id}")
                 success_count += 1
                 
             except Exception as e:
-                logger.exception(f"Error processing image {image.id}: {e}")
+                db.rollback()
+                logger.error(f"Error processing image {image.id}: {e}")
                 failures.append(f"Image {image.page_index}: {e}")
+                image.error_message = str(e)
+                if not job.get("attempt_counted"):
+                    # Failed before OCR (unreadable, rejected by triage, memory limit)
+                    image.attempts = (image.attempts or 0) + 1
+                batch.updated_at = datetime.utcnow()
+                db.commit()
                 # Continue with next image even if one fails
                 continue
+            finally:
+                if done % max(1, OCR_BATCH_PAGES) == 0:
+                    _publish_pipeline_metrics(pipeline.metrics())
+                # Once this page is saved, stop the whole batch (pages done so far are kept)
+                # rather than get OOM-killed
+                memory.check()
+                page_started = time.monotonic()
+
+        if pending:
+            _publish_pipeline_metrics(pipeline.metrics())
+            logger.info("Pipeline metrics for batch %s: %s", batch_id, pipeline.metrics())
         
         if success_count == 0:
             batch.status = BatchStatus.ERROR
@@ -91,3 +205,225 @@ def process_batch(batch_id: str):
     
     finally:
         db.close()
+
+# RQ job states in which the job will never run (or finish) the batch
+_DEAD_JOB_STATUSES = ("failed", "stopped", "canceled")
+
+def reset_stalled_batches(db: Session, batches: Iterable[Batch]) -> int:
+    """
+    Mark queued/processing batches whose run died as ERROR, so they can be
+    retried and stop counting toward the admission backlog. A run is dead when
+    its RQ job failed or was stopped (OOM-killed work horse, job timeout), or
+    when a processing batch made no progress for BATCH_STALE_MINUTES (the
+    whole worker was SIGKILLed or redeployed).
+    """
+    batches = [b for b in batches if b.status in (BatchStatus.PENDING, BatchStatus.PROCESSING)]
+    if not batches:
+        return 0
+    job_statuses = {}
+    job_ids = [b.job_id for b in batches if b.job_id]
+    if job_ids:
+        try:
+            for job in Job.fetch_many(job_ids, connection=redis_conn):
+                if job is not None:
+                    job_statuses[job.id] = job.get_status(refresh=False)
+        except RedisError:
+            logger.warning("Redis unavailable; checking stalled batches by last progress only")
+
+    stale_before = datetime.utcnow() - timedelta(minutes=BATCH_STALE_MINUTES)
+    reset = 0
+    for batch in batches:
+        job_status = job_statuses.get(batch.job_id)
+        if job_status in _DEAD_JOB_STATUSES:
+            reason = f"job {job_status}"
+        elif (batch.updated_at or batch.created_at) < stale_before and (
+            batch.status == BatchStatus.PROCESSING or not batch.job_id
+        ):
+            # Queued jobs may legitimately wait longer than that behind a backlog
+            reason = f"no progress for {BATCH_STALE_MINUTES:g} minutes"
+        else:
+            continue
+        # Only if the worker hasn't moved the batch on since it was loaded
+        updated = (
+            db.query(Batch)
+            .filter(Batch.id == batch.id, Batch.status == batch.status, Batch.updated_at == batch.updated_at)
+            .update({
+                Batch.status: BatchStatus.ERROR,
+                Batch.error_message: f"Processing stopped unexpectedly ({reason}); retry to resume",
+            }, synchronize_session=False)
+        )
+        if updated:
+            logger.warning("Batch %s stalled in %s (%s); marked as error", batch.id, batch.status.value, reason)
+            reset += updated
+    db.commit()
+    for batch in batches:
+        db.expire(batch)
+    return reset
+
+def recover_stalled_batches(db: Session) -> int:
+    """reset_stalled_batches over every queued or processing batch"""
+    return reset_stalled_batches(
+        db, db.query(Batch).filter(Batch.status.in_((BatchStatus.PENDING, BatchStatus.PROCESSING))).all()
+    )
+
+def _decode_stage(jobs, memory: JobMemory, override_rejection: bool = False):
+    """
+    Pipeline stage: quality triage, deskew and image decode (no DB access).
+    On a manual retry (override_rejection) rejected pages are only flagged and
+    OCR'd anyway, so a user can recover a page triage got wrong.
+    """
+    for job in jobs:
+        path = job["file_path"]
+        try:
+            if QUALITY_TRIAGE:
+                quality = assess_image(path)
+                job["quality"] = quality
+                if quality["status"] == "rejected" and override_rejection and "unreadable image" not in quality["notes"]:
+                    quality["status"] = "flagged"
+                    quality["notes"].append("rejection overridden by retry")
+                if quality["status"] == "rejected":
+                    continue
+                job["ocr_path"] = deskew_image(path, quality.get("skew_angle") or 0.0)
+                if job["ocr_path"]:
+                    logger.info("Deskewed image %s by %.2f degrees", job["image_id"], quality["skew_angle"])
+            # Unreadable files are left to the OCR stage, which reports the error.
+            # The inference server reads pages itself, so only decode for local OCR.
+            if OCR_BACKEND == "local":
+                job["pixels"] = memory.fit_page(cv2.imread(job.get("ocr_path") or path))
+        except Exception as exc:
+            logger.exception("Failed to prepare image %s", job["image_id"])
+            job["result"] = exc
+    return jobs
+
+def _ocr_stage(processor, jobs, form_type):
+    """Pipeline stage: OCR and field extraction for the pages that passed triage"""
+    ready = [
+        job for job in jobs
+        if "result" not in job and job.get("quality", {}).get("status") != "rejected"
+    ]
+    if ready:
+        logger.info("Processing images %s", ", ".join(f"{job['image_id']}: {job['file_path']}" for job in ready))
+        _count_attempts(ready)
+        try:
+            # Run OCR end-to-end (returns dict with data/confidence/raw_text per image)
+            # Hand the decoded pixels over so the processor can free each page when it is done
+            results = processor.process_documents(
+                [job.get("ocr_path") or job["file_path"] for job in ready],
+                form_type,
+                images=[job.pop("pixels", None) for job in ready]
+            )
+        except Exception as exc:
+            logger.exception("OCR failed for a group of %d images", len(ready))
+            results = [exc] * len(ready)
+        for job, result in zip(ready, results):
+            job["result"] = result
+    for job in jobs:
+        # Release decoded pixels before handing the job to the persist stage
+        job.pop("pixels", None)
+    return jobs
+
+def _count_attempts(jobs):
+    """
+    Count an attempt for pages entering OCR, committed before OCR starts so a
+    page that crashes the worker is still capped by IMAGE_MAX_ATTEMPTS. Uses
+    its own session: the batch session belongs to the persist thread.
+    """
+    ids = [job["image_id"] for job in jobs]
+    db = SessionLocal()
+    try:
+        db.query(Image).filter(Image.id.in_(ids)).update(
+            {Image.attempts: func.coalesce(Image.attempts, 0) + 1}, synchronize_session=False
+        )
+        db.commit()
+        for job in jobs:
+            job["attempt_counted"] = True
+    except Exception:
+        db.rollback()
+        logger.exception("Failed to count attempts for images %s", ", ".join(ids))
+    finally:
+        db.close()
+
+def _apply_quality(image: Image, quality: dict, ocr_path):
+    """Store triage metrics (and the deskewed copy used for OCR) on the image"""
+    image.sharpness = quality.get("sharpness")
+    image.ink_coverage = quality.get("ink_coverage")
+    image.brightness = quality.get("brightness")
+    image.skew_angle = quality.get("skew_angle")
+    image.quality_status = quality["status"]
+    image.quality_notes = "; ".join(quality["notes"]) or None
+    image.ocr_path = ocr_path
+
+def _publish_pipeline_metrics(metrics: dict):
+    """Expose stage queue depths and backpressure in the RQ job meta"""
+    _publish_job_meta("pipeline", metrics)
+
+def _publish_job_meta(key: str, value):
+    job = _current_job()
+    if job is not None:
+        job.meta[key] = value
+        job.save_meta()
+
+def _current_job():
+    try:
+        from rq import get_current_job
+        return get_current_job()
+    except Exception:
+        return None
+
+@contextmanager
+def _job_profile(batch_id: str):
+    """Profile the job when it was enqueued with job.meta["profile"]"""
+    job = _current_job()
+    if not profiling_active() or job is None or not job.meta.get("profile"):
+        yield
+        return
+    with profile("job", batch_id) as handle:
+        try:
+            yield
+        finally:
+            # Failed jobs are the ones most worth looking at
+            _publish_job_meta("profile", handle.name)
+
+def _reuse_result(reused: OcrResult, image: Image, form_type: str) -> OcrResult:
+    """
+    New result for image from another page's OCR output. Only the OCR text and
+    lines are copied; fields are extracted again, since the other page's
+    data_json may carry manual edits made in that batch.
+    """
+    effective_type = reused.form_type if form_type in (None, "", "AUTO") else form_type
+    if not effective_type:
+        effective_type = extraction.detect_form_type(reused.raw_text or "", image.file_path)
+    lines = json.loads(reused.ocr_lines_json) if reused.ocr_lines_json else extraction.lines_from_raw_text(reused.raw_text)
+    data, confidence = extraction.extract_fields(reused.raw_text or "", lines, effective_type)
+    return OcrResult(
+        image_id=image.id,
+        data_json=json.dumps(data, ensure_ascii=False),
+        confidence_json=json.dumps(confidence, ensure_ascii=False),
+        raw_text=reused.raw_text,
+        ocr_lines_json=reused.ocr_lines_json,
+        form_type=effective_type,
+        method=reused.method,
+    )
+
+def _find_reusable_result(db: Session, image: Image, form_type: str):
+    """
+    Latest OcrResult of another image with the same content hash that was
+    processed for the same requested (or resolved) form type. Only results
+    whose fields can be re-extracted from the OCR lines qualify (see
+    _reuse_result); GPT Vision, ROI and cascade pages are OCR'd again.
+    """
+    if not image.content_hash:
+        return None
+    return (
+        db.query(OcrResult)
+        .join(Image, OcrResult.image_id == Image.id)
+        .join(Batch, Image.batch_id == Batch.id)
+        .filter(
+            Image.content_hash == image.content_hash,
+            Image.id != image.id,
+            or_(Batch.form_type == form_type, OcrResult.form_type == form_type),
+            or_(OcrResult.method.is_(None), OcrResult.method.in_(REEXTRACT_METHODS))
+        )
+        .order_by(OcrResult.processed_at.desc())
+        .first()
+    )
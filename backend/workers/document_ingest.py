@@ -0,0 +1,129 @@
+"""
+Rasterization of multi-page uploads (PDF / TIFF) into per-page Image rows.
+
+Runs in the worker, never in the API process. Pages are decoded one at a time
+and written out before the next page is rendered, so a long scan is never held
+fully decoded in memory.
+"""
+import io
+import logging
+from pathlib import Path
+from typing import Iterator
+
+from PIL import Image as PILImage, ImageSequence
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from models import Batch, Image, SourceDocument
+from config import RASTER_DPI
+from storage import store_upload
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_EXTENSIONS = {".pdf", ".tif", ".tiff"}
+
+
+def is_document(filename: str) -> bool:
+    """Whether an upload is a multi-page document that needs rasterizing"""
+    return Path(filename or "").suffix.lower() in DOCUMENT_EXTENSIONS
+
+
+def iter_pages(path: str, dpi: int = RASTER_DPI) -> Iterator[PILImage.Image]:
+    """Yield RGB pages of a PDF or TIFF one at a time"""
+    if Path(path).suffix.lower() == ".pdf":
+        yield from _iter_pdf_pages(path, dpi)
+    else:
+        yield from _iter_tiff_pages(path, dpi)
+
+
+def _iter_pdf_pages(path: str, dpi: int) -> Iterator[PILImage.Image]:
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(path)
+    try:
+        for page_no in range(len(pdf)):
+            page = pdf[page_no]
+            try:
+                bitmap = page.render(scale=dpi / 72)
+                try:
+                    yield bitmap.to_pil().convert("RGB")
+                finally:
+                    bitmap.close()
+            finally:
+                page.close()
+    finally:
+        pdf.close()
+
+
+def _iter_tiff_pages(path: str, dpi: int) -> Iterator[PILImage.Image]:
+    with PILImage.open(path) as tif:
+        for frame in ImageSequence.Iterator(tif):
+            page = frame.convert("RGB")
+            # Scanner TIFFs are often 600 dpi; bring them down to the OCR resolution
+            source_dpi = frame.info.get("dpi", (0, 0))[0]
+            if source_dpi and source_dpi > dpi:
+                scale = dpi / float(source_dpi)
+                page = page.resize((max(1, int(page.width * scale)), max(1, int(page.height * scale))), PILImage.LANCZOS)
+            yield page
+
+
+def rasterize_documents(db: Session, batch: Batch) -> int:
+    """
+    Expand the batch's pending source documents into Image rows.
+    Loose images are numbered by their upload position and each scan takes
+    the slot of its upload_index, so its pages are placed where it was in the
+    upload and the images after it move down by its page count.
+    Returns the number of pages created.
+    """
+    # Last scan first: expanding it only shifts pages after it, so the slots of
+    # the earlier scans stay where they are
+    pending = sorted((d for d in batch.documents if not d.rasterized), key=lambda d: d.upload_index or 0, reverse=True)
+    if not pending:
+        return 0
+
+    created = 0
+    for document in pending:
+        # Drop pages left behind by an interrupted run; they have no OCR results yet
+        db.query(Image).filter(Image.document_id == document.id).delete(synchronize_session=False)
+        db.commit()
+
+        slot = document.upload_index or 0
+        batch_dir = Path(document.file_path).parent
+        page_count = 0
+
+        logger.info("Rasterizing %s at %d dpi", document.file_path, RASTER_DPI)
+        for page in iter_pages(document.file_path, RASTER_DPI):
+            # Named after the source so they never collide with loose uploads
+            file_path = batch_dir / f"source_{slot}_page_{page_count}.jpg"
+
+            buffer = io.BytesIO()
+            page.save(buffer, format="JPEG", quality=92)
+            page.close()
+            buffer.seek(0)
+            content_hash, _ = store_upload(buffer, file_path)
+            buffer.close()
+
+            db.add(Image(
+                batch_id=batch.id,
+                file_path=str(file_path),
+                page_index=slot + page_count,
+                content_hash=content_hash,
+                document_id=document.id
+            ))
+            db.commit()
+            page_count += 1
+
+        # Make room after the scan; committed with the rasterized flag so a rerun never shifts twice
+        db.query(Image).filter(
+            Image.batch_id == batch.id,
+            Image.page_index > slot,
+            or_(Image.document_id.is_(None), Image.document_id != document.id)
+        ).update({Image.page_index: Image.page_index + page_count - 1}, synchronize_session=False)
+        document.page_count = page_count
+        document.rasterized = True
+        db.commit()
+        created += page_count
+        logger.info("Rasterized %s into %d pages", document.file_path, page_count)
+
+    db.refresh(batch)
+    return created
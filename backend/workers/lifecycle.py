@@ -0,0 +1,416 @@
+"""
+Storage lifecycle: tiered retention and compaction of uploads and results.
+
+Three passes, each working in bounded chunks with one short transaction per
+batch or chunk of rows:
+
+1. Originals of finished batches older than LIFECYCLE_ARCHIVE_DAYS are added
+   to a per-day zip in LIFECYCLE_ARCHIVE_DIR ("<YYYY-MM-DD>.zip", members
+   "<batch_id>/<file name>") and each page is replaced by a re-encoded JPEG
+   display copy (long edge LIFECYCLE_DISPLAY_MAX_EDGE), so the review UI keeps
+   working. Deskewed OCR copies and rasterized PDF/TIFF sources are removed.
+   Only pages that have a result are archived; a batch with pages still
+   awaiting a (retried) result is revisited by later runs.
+   Pages are hardlinks into the object store, so files are only ever replaced,
+   never rewritten in place, and a stored object is deleted only once no
+   unarchived page or document references its hash and no other link remains.
+2. Files in EXPORT_DIR not used for LIFECYCLE_EXPORT_DAYS are pruned.
+3. raw_text / ocr_lines_json of results older than LIFECYCLE_COMPRESS_DAYS
+   are compressed in place (see models.CompressibleText). On SQLite, freed
+   pages are handed back to the filesystem when incremental auto-vacuum is on
+   (enable it once with vacuum_database()).
+
+Reclaimed bytes are reported per pass.
+"""
+import logging
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import cv2
+from sqlalchemy import Text, text, type_coerce, update
+
+from config import (
+    EXPORT_DIR, LIFECYCLE_ARCHIVE_DIR, LIFECYCLE_ARCHIVE_DAYS, LIFECYCLE_EXPORT_DAYS,
+    LIFECYCLE_COMPRESS_DAYS, LIFECYCLE_CHUNK_SIZE, LIFECYCLE_DISPLAY_MAX_EDGE, LIFECYCLE_DISPLAY_QUALITY
+)
+from database import SessionLocal, engine
+from models import Batch, BatchStatus, Image, OcrResult, SourceDocument, COMPRESSED_PREFIX, compress_text
+from storage import object_path
+
+logger = logging.getLogger(__name__)
+
+# Stored as-is in the archive; deflate gains nothing on these
+PRECOMPRESSED_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+# Display copies must save at least this fraction of the original to be worth it
+MIN_SAVING = 0.1
+# Shorter values are not worth compressing
+MIN_COMPRESS_CHARS = 256
+# Pages handed back per incremental vacuum step, so the write lock is held briefly
+VACUUM_STEP_PAGES = 2000
+
+
+def _release(path: Path) -> int:
+    """Unlink path; returns the bytes actually freed (0 while other hardlinks remain)"""
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return 0
+    path.unlink()
+    return st.st_size if st.st_nlink <= 1 else 0
+
+
+def _display_copy(path: Path) -> Optional[Path]:
+    """
+    Write a downscaled JPEG of the page next to it (temporary name); None when
+    the page can't be decoded or the copy would not be meaningfully smaller
+    """
+    img = cv2.imread(str(path))
+    if img is None:
+        return None
+    h, w = img.shape[:2]
+    scale = LIFECYCLE_DISPLAY_MAX_EDGE / max(h, w)
+    if scale < 1:
+        img = cv2.resize(img, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+    ok, buffer = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, LIFECYCLE_DISPLAY_QUALITY])
+    if not ok or len(buffer) > path.stat().st_size * (1 - MIN_SAVING):
+        return None
+    tmp = path.with_name(f".{path.name}.display.tmp")
+    tmp.write_bytes(buffer.tobytes())
+    return tmp
+
+
+def _append_to_archive(day: str, members: List[Tuple[str, Path]]) -> int:
+    """
+    Add files to the day's zip. The archive is rebuilt beside the old one and
+    swapped in, so an interrupted run never leaves a truncated archive.
+    Members already present (from an interrupted run) are skipped.
+    Returns the growth of the archive in bytes.
+    """
+    LIFECYCLE_ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    archive = LIFECYCLE_ARCHIVE_DIR / f"{day}.zip"
+    before = archive.stat().st_size if archive.exists() else 0
+    fd, tmp_name = tempfile.mkstemp(dir=LIFECYCLE_ARCHIVE_DIR, suffix=".tmp")
+    os.close(fd)
+    try:
+        if before:
+            shutil.copyfile(archive, tmp_name)
+        with zipfile.ZipFile(tmp_name, "a") as zf:
+            existing = set(zf.namelist())
+            for arcname, path in members:
+                if arcname in existing:
+                    continue
+                compression = zipfile.ZIP_STORED if path.suffix.lower() in PRECOMPRESSED_SUFFIXES else zipfile.ZIP_DEFLATED
+                zf.write(path, arcname, compress_type=compression)
+        with open(tmp_name, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_name, archive)
+    finally:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+    return archive.stat().st_size - before
+
+
+def _archive_day(db, day: str, batches: List[Batch], stats: Dict[str, Any]):
+    """Archive the originals of one day's batches and swap in display copies"""
+    pages = []  # (batch, image, original, display copy)
+    documents = []  # (batch, document, original)
+    try:
+        for batch in batches:
+            for image in batch.images:
+                path = Path(image.file_path)
+                # Pages without a result may still be retried, which needs the original
+                if image.archive_member or image.ocr_result is None or not path.exists():
+                    continue
+                display = _display_copy(path)
+                if display is not None:
+                    pages.append((batch, image, path, display))
+            for document in batch.documents:
+                path = Path(document.file_path)
+                if document.rasterized and not document.archive_member and path.exists():
+                    documents.append((batch, document, path))
+
+        members = [(f"{batch.id}/{path.name}", path) for batch, _, path, _ in pages]
+        members += [(f"{batch.id}/{path.name}", path) for batch, _, path in documents]
+        if members:
+            stats["archive_bytes"] += _append_to_archive(day, members)
+
+        # Originals are safely archived; replace them batch by batch
+        hashes = _replace_originals(db, day, batches, pages, documents, stats)
+    finally:
+        # Display copies not swapped in (on failure)
+        for _, _, _, display in pages:
+            display.unlink(missing_ok=True)
+
+    stats["reclaimed_bytes"] += _release_objects(db, hashes)
+
+
+def _replace_originals(db, day: str, batches: List[Batch], pages, documents, stats: Dict[str, Any]) -> set:
+    """
+    Swap display copies in for archived pages and drop archived sources, one
+    transaction per batch. Files are only unlinked once the batch's new paths
+    are committed, so a crash never leaves a row pointing at a missing file.
+    Returns the content hashes that lost a reference.
+    """
+    hashes = set()
+    for batch in batches:
+        obsolete = []  # Unlinked after the commit
+        for page_batch, image, path, display in pages:
+            if page_batch is not batch:
+                continue
+            target = path.with_suffix(".jpg")
+            if target == path:
+                # The display copy replaces the original's link; other hardlinks keep its bytes
+                st = path.stat()
+                stats["reclaimed_bytes"] += st.st_size if st.st_nlink <= 1 else 0
+            else:
+                obsolete.append(path)
+            os.replace(display, target)
+            stats["reclaimed_bytes"] -= target.stat().st_size
+            image.file_path = str(target)
+            image.archive_member = f"{day}.zip:{batch.id}/{path.name}"
+            if image.ocr_path:
+                # Deskewed copy is only needed for OCR, which has already run
+                obsolete.append(Path(image.ocr_path))
+                image.ocr_path = None
+            if image.content_hash:
+                hashes.add(image.content_hash)
+            stats["pages"] += 1
+        for doc_batch, document, path in documents:
+            if doc_batch is not batch:
+                continue
+            obsolete.append(path)
+            document.archive_member = f"{day}.zip:{batch.id}/{path.name}"
+            if document.content_hash:
+                hashes.add(document.content_hash)
+            stats["documents"] += 1
+        if _fully_archivable(batch):
+            batch.archived_at = datetime.utcnow()
+            stats["batches"] += 1
+        db.commit()
+        for path in obsolete:
+            stats["reclaimed_bytes"] += _release(path)
+    return hashes
+
+
+def _fully_archivable(batch: Batch) -> bool:
+    """
+    Whether no page can still be (re)processed: batches with failed pages or
+    unexpanded scans stay unarchived, so later runs pick up pages that a retry
+    completes.
+    """
+    return (all(image.ocr_result is not None for image in batch.images)
+            and all(document.rasterized for document in batch.documents))
+
+
+def _release_objects(db, hashes) -> int:
+    """Delete stored objects that nothing unarchived refers to any more"""
+    freed = 0
+    for content_hash in hashes:
+        in_use = (
+            db.query(Image.id).filter(Image.content_hash == content_hash, Image.archive_member.is_(None)).first()
+            or db.query(SourceDocument.id).filter(
+                SourceDocument.content_hash == content_hash, SourceDocument.archive_member.is_(None)
+            ).first()
+        )
+        path = object_path(content_hash)
+        # A remaining hardlink means a page we don't know about still uses it
+        if in_use or not path.exists() or path.stat().st_nlink > 1:
+            continue
+        freed += _release(path)
+    return freed
+
+
+def archive_originals(days: int = LIFECYCLE_ARCHIVE_DAYS, chunk_size: int = LIFECYCLE_CHUNK_SIZE,
+                      dry_run: bool = False) -> Dict[str, Any]:
+    """Archive originals of finished batches created more than `days` ago"""
+    stats = {"batches": 0, "pages": 0, "documents": 0, "archive_bytes": 0, "reclaimed_bytes": 0, "failed": 0}
+    if days <= 0:
+        return stats
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    db = SessionLocal()
+    failed = set()
+    partial = set()  # Visited this run but left unarchived (pages still awaiting a result)
+    try:
+        query = db.query(Batch).filter(
+            Batch.status.in_((BatchStatus.DONE, BatchStatus.ERROR)),
+            Batch.archived_at.is_(None),
+            Batch.created_at < cutoff,
+        )
+        if dry_run:
+            for batch in query.yield_per(chunk_size):
+                stats["batches"] += _fully_archivable(batch)
+                for row in list(batch.images) + list(batch.documents):
+                    path = Path(row.file_path)
+                    if isinstance(row, Image) and row.ocr_result is None:
+                        continue
+                    if isinstance(row, SourceDocument) and not row.rasterized:
+                        continue
+                    if not row.archive_member and path.exists():
+                        stats["pages" if isinstance(row, Image) else "documents"] += 1
+                        stats["reclaimed_bytes"] += path.stat().st_size
+            return stats
+
+        while True:
+            skip = failed | partial
+            chunk = (
+                query.filter(Batch.id.notin_(skip)) if skip else query
+            ).order_by(Batch.created_at).limit(chunk_size).all()
+            if not chunk:
+                break
+            by_day: Dict[str, List[Batch]] = {}
+            for batch in chunk:
+                by_day.setdefault(batch.created_at.date().isoformat(), []).append(batch)
+            for day, batches in by_day.items():
+                try:
+                    _archive_day(db, day, batches, stats)
+                except Exception:
+                    db.rollback()
+                    logger.exception("Failed to archive batches from %s", day)
+                    failed.update(batch.id for batch in batches if batch.archived_at is None)
+                    continue
+                partial.update(batch.id for batch in batches if batch.archived_at is None)
+            logger.info("Archived %d batches so far (%d bytes reclaimed)", stats["batches"], stats["reclaimed_bytes"])
+        stats["failed"] = len(failed)
+        return stats
+    finally:
+        db.close()
+
+
+def prune_exports(days: int = LIFECYCLE_EXPORT_DAYS, dry_run: bool = False) -> Dict[str, Any]:
+    """Remove export files not written or served for `days` (the cache refreshes mtime on use)"""
+    stats = {"files": 0, "reclaimed_bytes": 0}
+    if days <= 0:
+        return stats
+    cutoff = time.time() - days * 86400
+    for path in list(EXPORT_DIR.rglob("*")):
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue
+        if not path.is_file() or st.st_mtime >= cutoff:
+            continue
+        stats["files"] += 1
+        stats["reclaimed_bytes"] += st.st_size
+        if not dry_run:
+            path.unlink(missing_ok=True)
+    if not dry_run:
+        # Dated export folders left empty (deepest first)
+        for directory in sorted((p for p in EXPORT_DIR.rglob("*") if p.is_dir()), reverse=True):
+            if not any(directory.iterdir()):
+                directory.rmdir()
+    return stats
+
+
+def compact_results(days: int = LIFECYCLE_COMPRESS_DAYS, chunk_size: int = LIFECYCLE_CHUNK_SIZE,
+                    dry_run: bool = False) -> Dict[str, Any]:
+    """Compress stored OCR text of results processed more than `days` ago"""
+    stats = {"rows": 0, "reclaimed_bytes": 0, "db_file_reclaimed_bytes": 0}
+    if days <= 0:
+        return stats
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    # Read the stored values as-is, without transparent decompression
+    raw_text = type_coerce(OcrResult.raw_text, Text)
+    raw_lines = type_coerce(OcrResult.ocr_lines_json, Text)
+    db = SessionLocal()
+    try:
+        last_id = None
+        while True:
+            # Keyset pagination over the primary key keeps every chunk cheap
+            query = db.query(OcrResult.id, raw_text, raw_lines).filter(OcrResult.processed_at < cutoff)
+            if last_id is not None:
+                query = query.filter(OcrResult.id > last_id)
+            rows = query.order_by(OcrResult.id).limit(chunk_size).all()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            updates = []
+            for result_id, *values in rows:
+                compacted = [_compact(value) for value in values]
+                saved = sum(len(old.encode("utf-8")) - len(new) for old, new in zip(values, compacted) if new is not old)
+                if not saved:
+                    continue
+                stats["rows"] += 1
+                stats["reclaimed_bytes"] += saved
+                updates.append({"id": result_id, "raw_text": compacted[0], "ocr_lines_json": compacted[1]})
+            if updates and not dry_run:
+                db.execute(update(OcrResult), updates)
+                db.commit()
+        logger.info("Compressed OCR text of %d results (%d bytes)", stats["rows"], stats["reclaimed_bytes"])
+    finally:
+        db.close()
+    if not dry_run:
+        stats["db_file_reclaimed_bytes"] = _incremental_vacuum()
+    return stats
+
+
+def _compact(value):
+    """Compressed value, or the same object when it isn't worth compressing"""
+    if value is None or len(value) < MIN_COMPRESS_CHARS or value.startswith(COMPRESSED_PREFIX):
+        return value
+    compressed = compress_text(value)
+    return compressed if len(compressed) < len(value.encode("utf-8")) else value
+
+
+def _incremental_vacuum() -> int:
+    """Hand free SQLite pages back to the filesystem in short steps; bytes released"""
+    if engine.dialect.name != "sqlite":
+        return 0
+    with engine.connect() as conn:
+        page_size = conn.execute(text("PRAGMA page_size")).scalar()
+        free_pages = conn.execute(text("PRAGMA freelist_count")).scalar()
+        if conn.execute(text("PRAGMA auto_vacuum")).scalar() != 2:
+            if free_pages:
+                logger.info("%d bytes free inside the database; run with --vacuum once to release them",
+                            free_pages * page_size)
+            return 0
+        remaining = free_pages
+        while remaining:
+            conn.exec_driver_sql(f"PRAGMA incremental_vacuum({VACUUM_STEP_PAGES})")
+            conn.commit()
+            left = conn.execute(text("PRAGMA freelist_count")).scalar()
+            if left >= remaining:
+                break  # Held up by another connection; the next run continues
+            remaining = left
+        return (free_pages - remaining) * page_size
+
+
+def vacuum_database() -> int:
+    """
+    One-off full VACUUM that also switches SQLite to incremental auto-vacuum,
+    so later runs can release space without locking. Locks the database for
+    the whole rebuild: run in a maintenance window. Returns bytes released.
+    """
+    if engine.dialect.name != "sqlite":
+        logger.info("VACUUM is left to the database server for %s", engine.dialect.name)
+        return 0
+    db_path = Path(engine.url.database)
+    before = db_path.stat().st_size
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+        conn.execute(text("VACUUM"))
+    return before - db_path.stat().st_size
+
+
+def run_lifecycle(dry_run: bool = False, progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None
+                  ) -> Dict[str, Any]:
+    """Run all passes; returns per-pass stats and the total bytes reclaimed"""
+    started = time.monotonic()
+    stats: Dict[str, Any] = {"dry_run": dry_run}
+    for name, run in (("archive", archive_originals), ("exports", prune_exports), ("results", compact_results)):
+        stats[name] = run(dry_run=dry_run)
+        logger.info("Lifecycle %s: %s", name, stats[name])
+        if progress_callback:
+            progress_callback(dict(stats))
+    stats["reclaimed_bytes"] = (
+        stats["archive"]["reclaimed_bytes"] + stats["exports"]["reclaimed_bytes"]
+        + stats["results"]["db_file_reclaimed_bytes"]
+    )
+    stats["elapsed"] = round(time.monotonic() - started, 2)
+    return stats
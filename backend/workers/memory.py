@@ -0,0 +1,168 @@
+"""
+Per-job memory accounting and ceiling for OCR workers.
+
+JobMemory samples the process RSS in a background thread while a job runs and
+reports the baseline, peak and final RSS (plus the top tracemalloc allocation
+sites when MEMORY_TRACEMALLOC is enabled). With JOB_MEMORY_LIMIT_MB set, pages
+are downscaled before OCR when their estimated working set would not fit in
+the remaining headroom, and check() aborts the job with MemoryLimitExceeded
+once RSS stays above the limit, instead of letting the kernel OOM-kill the
+worker.
+"""
+import ctypes
+import ctypes.util
+import gc
+import logging
+import math
+import os
+import threading
+import tracemalloc
+from typing import Optional
+
+import cv2
+
+from config import JOB_MEMORY_LIMIT_MB, MEMORY_MIN_PAGE_EDGE, MEMORY_TRACEMALLOC
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+SAMPLE_SECONDS = 0.2
+# Layout analysis, detection and crops hold several copies of a decoded page
+PAGE_WORKING_SET_FACTOR = 6
+TRACEMALLOC_TOP = 10
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_libc = None
+
+
+class MemoryLimitExceeded(MemoryError):
+    """The job would exceed (or stays above) the per-job memory ceiling"""
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        import resource
+        # Not Linux: fall back to the lifetime peak (bytes on macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def release_memory():
+    """Collect garbage and hand freed heap pages back to the OS (glibc only)"""
+    global _libc
+    gc.collect()
+    if _libc is None:
+        name = ctypes.util.find_library("c")
+        try:
+            _libc = ctypes.CDLL(name) if name else False
+        except OSError:
+            _libc = False
+    if _libc and hasattr(_libc, "malloc_trim"):
+        _libc.malloc_trim(0)
+
+
+class JobMemory:
+    """Context manager tracking RSS for one job and enforcing its ceiling"""
+
+    def __init__(self, limit_mb: float = JOB_MEMORY_LIMIT_MB, trace: bool = MEMORY_TRACEMALLOC):
+        self.limit = int(limit_mb * MB) if limit_mb > 0 else None
+        self.trace = trace
+        self.baseline = 0
+        self.peak = 0
+        self.downscaled_pages = 0
+        self._over_limit = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started_tracing = False
+
+    def __enter__(self):
+        self.baseline = self.peak = current_rss()
+        if self.trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._thread = threading.Thread(target=self._sample, name="job-memory", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._record(current_rss())
+        return False
+
+    def _sample(self):
+        while not self._stop.wait(SAMPLE_SECONDS):
+            self._record(current_rss())
+
+    def _record(self, rss: int):
+        if rss > self.peak:
+            self.peak = rss
+        if self.limit and rss > self.limit:
+            self._over_limit = True
+
+    def headroom(self) -> float:
+        """Bytes left under the ceiling (infinite when no limit is set)"""
+        if not self.limit:
+            return math.inf
+        return self.limit - current_rss()
+
+    def check(self):
+        """Raise MemoryLimitExceeded if RSS is still above the ceiling after freeing what we can"""
+        if not self._over_limit:
+            return
+        self._over_limit = False
+        release_memory()
+        rss = current_rss()
+        self._record(rss)
+        if rss > self.limit:
+            raise MemoryLimitExceeded(
+                f"worker memory {rss // MB} MB exceeds the job limit of {self.limit // MB} MB"
+            )
+
+    def fit_page(self, img):
+        """
+        Downscale a decoded page so its estimated OCR working set fits the
+        remaining headroom; fails if that would need a long edge below
+        MEMORY_MIN_PAGE_EDGE.
+        """
+        if img is None or not self.limit:
+            return img
+        needed = img.nbytes * PAGE_WORKING_SET_FACTOR
+        available = self.headroom()
+        if needed <= available:
+            return img
+        h, w = img.shape[:2]
+        scale = math.sqrt(max(available, 0) / needed)
+        if max(h, w) * scale < MEMORY_MIN_PAGE_EDGE:
+            raise MemoryLimitExceeded(
+                f"{w}x{h} page needs ~{needed // MB} MB but only {max(available, 0) // MB} MB "
+                f"is left under the {self.limit // MB} MB job limit"
+            )
+        self.downscaled_pages += 1
+        logger.warning("Downscaling %dx%d page by %.2f to fit the job memory limit", w, h, scale)
+        return cv2.resize(img, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+
+    def report(self) -> dict:
+        report = {
+            "baseline_mb": round(self.baseline / MB, 1),
+            "peak_mb": round(self.peak / MB, 1),
+            "job_peak_mb": round((self.peak - self.baseline) / MB, 1),
+            "rss_mb": round(current_rss() / MB, 1),
+            "limit_mb": self.limit // MB if self.limit else None,
+            "downscaled_pages": self.downscaled_pages,
+        }
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            _, traced_peak = tracemalloc.get_traced_memory()
+            report["tracemalloc_peak_mb"] = round(traced_peak / MB, 1)
+            report["tracemalloc_top"] = [
+                f"{stat.traceback[0].filename}:{stat.traceback[0].lineno} {stat.size / MB:.1f} MB"
+                for stat in snapshot.statistics("lineno")[:TRACEMALLOC_TOP]
+            ]
+            if self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
+        return report
@@ -0,0 +1,198 @@
+"""
+Staged processing pipeline connected by bounded queues.
+
+Each stage runs in its own thread and hands items to the next stage through a
+queue.Queue(maxsize=...). When a downstream stage falls behind its input queue
+fills up and upstream stages block (backpressure), so memory stays bounded by
+the queue sizes. The caller consumes the last stage's output by iterating
+over run(); that is where results are persisted, keeping DB sessions on the
+calling thread.
+
+OpenCV decoding and Paddle inference release the GIL, so decoding the next
+page and writing the previous one overlap with inference of the current one.
+
+Per-stage metrics (see metrics()):
+- processed: items completed by the stage
+- busy_seconds: time spent inside the stage function
+- starved_seconds: time spent waiting for input
+- blocked_seconds / backpressure_events: time spent waiting on a full output queue
+- queue_depth / max_queue_depth: current and peak size of the stage's input queue
+"""
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+_POLL_SECONDS = 0.1
+
+
+class Stage:
+    """
+    One pipeline step. fn receives a list of up to batch_size items and returns
+    one output per input, in order. Larger batches are only formed from items
+    already waiting in the queue, so a stage never delays work to fill a batch.
+    """
+
+    def __init__(self, name: str, fn: Callable[[List[Any]], List[Any]], batch_size: int = 1):
+        self.name = name
+        self.fn = fn
+        self.batch_size = max(1, batch_size)
+
+
+class StagePipeline:
+    def __init__(self, stages: List[Stage], queue_size: int = 4, sink_name: str = "sink"):
+        self.stages = stages
+        self.sink_name = sink_name
+        # queues[i] feeds stages[i]; the last queue feeds the caller
+        self.queues = [queue.Queue(maxsize=max(1, queue_size)) for _ in range(len(stages) + 1)]
+        names = [stage.name for stage in stages] + [sink_name]
+        self._stats = {
+            name: {
+                "processed": 0,
+                "busy_seconds": 0.0,
+                "starved_seconds": 0.0,
+                "blocked_seconds": 0.0,
+                "backpressure_events": 0,
+                "max_queue_depth": 0,
+            }
+            for name in names
+        }
+        self._names = names
+        self._stop = threading.Event()
+        self._error = None
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Snapshot of per-stage counters and queue depths"""
+        snapshot = {}
+        for name, q in zip(self._names, self.queues):
+            stats = dict(self._stats[name])
+            for key in ("busy_seconds", "starved_seconds", "blocked_seconds"):
+                stats[key] = round(stats[key], 3)
+            stats["queue_depth"] = q.qsize()
+            snapshot[name] = stats
+        return snapshot
+
+    def run(self, items: Iterable[Any]) -> Iterator[Any]:
+        """Feed items through all stages and yield the final outputs in order"""
+        threads = [threading.Thread(target=self._feed, args=(items,), name="pipeline-feed", daemon=True)]
+        for index, stage in enumerate(self.stages):
+            threads.append(threading.Thread(
+                target=self._run_stage, args=(index, stage), name=f"pipeline-{stage.name}", daemon=True
+            ))
+        for thread in threads:
+            thread.start()
+
+        sink_stats = self._stats[self.sink_name]
+        try:
+            while True:
+                item = self._get(self.queues[-1], sink_stats)
+                if item is _END:
+                    break
+                started = time.monotonic()
+                yield item
+                sink_stats["busy_seconds"] += time.monotonic() - started
+                sink_stats["processed"] += 1
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def _feed(self, items):
+        first_stats = self._stats[self._names[0]]
+        try:
+            for item in items:
+                if not self._put(self.queues[0], item, first_stats, count_blocked=False):
+                    return
+        except Exception as exc:
+            self._fail(exc)
+            return
+        self._put(self.queues[0], _END, first_stats, count_blocked=False)
+
+    def _run_stage(self, index: int, stage: Stage):
+        stats = self._stats[stage.name]
+        inbox, outbox = self.queues[index], self.queues[index + 1]
+        next_stats = self._stats[self._names[index + 1]]
+        try:
+            done = False
+            while not done:
+                item = self._get(inbox, stats)
+                if item is None or item is _END:
+                    break
+                batch = [item]
+                # Opportunistically batch whatever is already queued
+                while len(batch) < stage.batch_size:
+                    try:
+                        item = inbox.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _END:
+                        done = True
+                        break
+                    batch.append(item)
+
+                started = time.monotonic()
+                outputs = stage.fn(batch)
+                stats["busy_seconds"] += time.monotonic() - started
+                stats["processed"] += len(batch)
+
+                for output in outputs:
+                    if not self._put(outbox, output, stats, depth_stats=next_stats):
+                        return
+            self._put(outbox, _END, stats, depth_stats=next_stats)
+        except Exception as exc:
+            logger.exception("Pipeline stage %s failed", stage.name)
+            self._fail(exc)
+
+    def _fail(self, exc):
+        if self._error is None:
+            self._error = exc
+        self._stop.set()
+        # Unblock the consumer
+        try:
+            self.queues[-1].put_nowait(_END)
+        except queue.Full:
+            pass
+
+    def _get(self, q: queue.Queue, stats: Dict[str, Any]):
+        try:
+            return q.get_nowait()
+        except queue.Empty:
+            pass
+        started = time.monotonic()
+        try:
+            while True:
+                try:
+                    return q.get(timeout=_POLL_SECONDS)
+                except queue.Empty:
+                    if self._stop.is_set():
+                        return _END if q is self.queues[-1] else None
+        finally:
+            stats["starved_seconds"] += time.monotonic() - started
+
+    def _put(self, q: queue.Queue, item, stats, depth_stats=None, count_blocked=True) -> bool:
+        """Put with backpressure accounting; False if the pipeline was stopped"""
+        depth_stats = depth_stats or stats
+        try:
+            q.put_nowait(item)
+        except queue.Full:
+            started = time.monotonic()
+            if count_blocked:
+                stats["backpressure_events"] += 1
+            while True:
+                if self._stop.is_set():
+                    return False
+                try:
+                    q.put(item, timeout=_POLL_SECONDS)
+                    break
+                except queue.Full:
+                    continue
+            if count_blocked:
+                stats["blocked_seconds"] += time.monotonic() - started
+        depth_stats["max_queue_depth"] = max(depth_stats["max_queue_depth"], q.qsize())
+        return True
@@ -0,0 +1,210 @@
+"""
+Bulk re-extraction of stored OCR output.
+
+Re-runs the template/rule extraction over OcrResult rows that are already in the
+database, so template or heuristic changes can be applied without re-running OCR.
+Rows are streamed in keyset-paginated chunks, extracted in a process pool and
+written back in one transaction per chunk.
+
+Note: re-extraction overwrites data_json, including any manual edits made
+through the review UI. Results produced by GPT Vision or ROI extraction are
+left untouched.
+"""
+import json
+import logging
+import time
+from collections import deque
+from datetime import date, datetime, timedelta
+from multiprocessing import Pool
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from sqlalchemy import update, or_
+
+from models import Batch, Image, OcrResult
+from database import SessionLocal
+from config import REEXTRACT_CHUNK_SIZE, REEXTRACT_PROCESSES
+from ocr import extraction
+from ocr.templates import FORM_TEMPLATES
+
+logger = logging.getLogger(__name__)
+
+# Only results from the full-page text heuristics can be re-extracted
+REEXTRACT_METHODS = ("paddle_ocr",)
+
+
+def _resolve_form_type(stored_type, batch_type, raw_text, file_path) -> str:
+    """Template the row was (or would have been) extracted with"""
+    if stored_type:
+        return stored_type
+    if batch_type in (None, "", "AUTO"):
+        return extraction.detect_form_type(raw_text, file_path)
+    return batch_type
+
+
+def _reextract_chunk(rows: List[Tuple], form_type: Optional[str]) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Worker-side extraction for one chunk.
+    Returns (row updates keyed by OcrResult id, number of skipped rows).
+    """
+    updates = []
+    skipped = 0
+    for result_id, batch_id, raw_text, lines_json, stored_type, batch_type, file_path in rows:
+        effective_type = _resolve_form_type(stored_type, batch_type, raw_text, file_path)
+        if form_type and effective_type != form_type:
+            skipped += 1
+            continue
+
+        lines = json.loads(lines_json) if lines_json else extraction.lines_from_raw_text(raw_text)
+        data, confidence = extraction.extract_fields(raw_text or "", lines, effective_type)
+        updates.append({
+            "id": result_id,
+            "batch_id": batch_id,
+            "data_json": json.dumps(data, ensure_ascii=False),
+            "confidence_json": json.dumps(confidence, ensure_ascii=False),
+            "form_type": effective_type,
+        })
+    return updates, skipped
+
+
+def _build_query(db, form_type, date_from, date_to):
+    query = (
+        db.query(
+            OcrResult.id,
+            Image.batch_id,
+            OcrResult.raw_text,
+            OcrResult.ocr_lines_json,
+            OcrResult.form_type,
+            Batch.form_type,
+            Image.file_path,
+        )
+        .join(Image, OcrResult.image_id == Image.id)
+        .join(Batch, Image.batch_id == Batch.id)
+        .filter(or_(OcrResult.method.is_(None), OcrResult.method.in_(REEXTRACT_METHODS)))
+    )
+    if form_type:
+        # Legacy rows have no stored form type and are resolved per row in the workers
+        query = query.filter(or_(OcrResult.form_type == form_type, OcrResult.form_type.is_(None)))
+    if date_from:
+        query = query.filter(Batch.created_at >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        query = query.filter(Batch.created_at < datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+    return query
+
+
+def _iter_chunks(db, query, chunk_size: int):
+    """Keyset pagination over OcrResult.id so memory stays bounded"""
+    last_id = None
+    while True:
+        page = query
+        if last_id is not None:
+            page = page.filter(OcrResult.id > last_id)
+        rows = [tuple(r) for r in page.order_by(OcrResult.id).limit(chunk_size).all()]
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        yield rows
+
+
+def _write_chunk(db, updates: List[Dict[str, Any]]):
+    """Apply one chunk of updates in a single transaction"""
+    if not updates:
+        return
+    db.execute(
+        update(OcrResult),
+        [{k: v for k, v in u.items() if k != "batch_id"} for u in updates],
+    )
+    batch_ids = {u["batch_id"] for u in updates}
+    db.query(Batch).filter(Batch.id.in_(batch_ids)).update(
+        {Batch.updated_at: datetime.utcnow()}, synchronize_session=False
+    )
+    db.commit()
+
+
+def reextract_results(
+    form_type: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    chunk_size: int = REEXTRACT_CHUNK_SIZE,
+    processes: int = REEXTRACT_PROCESSES,
+    progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Re-run field extraction over stored OCR results.
+
+    form_type restricts to one template; date_from/date_to (inclusive) filter on
+    the batch creation date. Returns the final progress stats.
+    """
+    if form_type and form_type not in FORM_TEMPLATES:
+        raise ValueError(f"Unknown form type: {form_type}")
+
+    db = SessionLocal()
+    pool = Pool(processes) if processes > 1 else None
+    started = time.monotonic()
+    stats = {"total": 0, "processed": 0, "updated": 0, "skipped": 0, "rows_per_sec": 0.0, "elapsed": 0.0}
+
+    def report(done_rows, updates, skipped):
+        stats["processed"] += done_rows
+        stats["updated"] += len(updates)
+        stats["skipped"] += skipped
+        stats["elapsed"] = round(time.monotonic() - started, 2)
+        stats["rows_per_sec"] = round(stats["processed"] / stats["elapsed"], 1) if stats["elapsed"] else 0.0
+        logger.info(
+            "Re-extraction %d/%d rows (%d updated, %d skipped, %.1f rows/sec)",
+            stats["processed"], stats["total"], stats["updated"], stats["skipped"], stats["rows_per_sec"]
+        )
+        if progress_callback:
+            progress_callback(dict(stats))
+
+    try:
+        query = _build_query(db, form_type, date_from, date_to)
+        stats["total"] = query.count()
+        logger.info("Re-extracting %d OCR results (form_type=%s, from=%s, to=%s)",
+                    stats["total"], form_type or "ALL", date_from, date_to)
+
+        # Keep at most two chunks per process in flight so reads never run ahead of writes
+        in_flight = deque()
+        max_in_flight = max(1, processes) * 2
+
+        for rows in _iter_chunks(db, query, chunk_size):
+            if pool is None:
+                updates, skipped = _reextract_chunk(rows, form_type)
+                _write_chunk(db, updates)
+                report(len(rows), updates, skipped)
+                continue
+
+            in_flight.append((len(rows), pool.apply_async(_reextract_chunk, (rows, form_type))))
+            if len(in_flight) >= max_in_flight:
+                done_rows, pending = in_flight.popleft()
+                updates, skipped = pending.get()
+                _write_chunk(db, updates)
+                report(done_rows, updates, skipped)
+
+        while in_flight:
+            done_rows, pending = in_flight.popleft()
+            updates, skipped = pending.get()
+            _write_chunk(db, updates)
+            report(done_rows, updates, skipped)
+
+        stats["elapsed"] = round(time.monotonic() - started, 2)
+        logger.info("Re-extraction complete: %s", stats)
+        return stats
+
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        db.close()
+
+
+def run_reextract_job(**kwargs) -> Dict[str, Any]:
+    """RQ entry point that publishes progress in the job meta"""
+    from rq import get_current_job
+
+    job = get_current_job()
+
+    def publish(stats):
+        if job is not None:
+            job.meta["progress"] = stats
+            job.save_meta()
+
+    return reextract_results(progress_callback=publish, **kwargs)
@@ -37,6 +37,12 @@ export const updateBatch = async (batchId, data) => {
     return response.data;
 };
 
+// Re-run only the failed pages of a batch
+export const retryBatch = async (batchId) => {
+    const response = await api.post(`/api/batches/${batchId}/retry`);
+    return response.data;
+};
+
 // Export batch
 export const exportBatch = async (batchId, format = 'csv') => {
     const response = await api.get(`/api/batches/${batchId}/export?format=${format}`, {
@@ -49,6 +55,7 @@ export const batchApi = {
     createBatch,
     getBatch,
     updateBatch,
+    retryBatch,
     exportBatch
 };
 
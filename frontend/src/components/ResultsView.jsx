@@ -1,6 +1,6 @@
 import React, { useEffect, useState, useMemo } from 'react';
 import { useParams, Link } from 'react-router-dom';
-import { getBatch, updateBatch, exportBatch } from '../api';
+import { getBatch, updateBatch, exportBatch, retryBatch } from '../api';
 import FieldEditor from './FieldEditor';
 import MarkdownPreview from './MarkdownPreview';
 import ProcessingSteps from './ProcessingSteps';
@@ -12,6 +12,8 @@ const ResultsView = () => {
     const [selectedImageIndex, setSelectedImageIndex] = useState(0);
     const [activeTab, setActiveTab] = useState('fields'); // fields, markdown, csv
     const [saving, setSaving] = useState(false);
+    const [retrying, setRetrying] = useState(false);
+    const [pollKey, setPollKey] = useState(0); // Bumped to restart polling after a retry
     const [error, setError] = useState('');
 
     const apiBaseUrl = useMemo(() => import.meta.env.VITE_API_URL || 'http://localhost:8000', []);
@@ -36,7 +38,7 @@ const ResultsView = () => {
         };
 
         fetchBatch();
-    }, [batchId]);
+    }, [batchId, pollKey]);
 
     const handleUpdate = async () => {
         if (!batch || !batch.images[selectedImageIndex]) return;
@@ -56,6 +58,21 @@ const ResultsView = () => {
         }
     };
 
+    const handleRetry = async () => {
+        setRetrying(true);
+        try {
+            // Only failed or never processed pages are re-run
+            const data = await retryBatch(batchId);
+            setBatch(data);
+            setPollKey((key) => key + 1);
+        } catch (error) {
+            console.error("Retry failed:", error);
+            alert(error.response?.data?.detail || "Retry failed");
+        } finally {
+            setRetrying(false);
+        }
+    };
+
     const handleFieldChange = (newData) => {
         if (!batch) return;
 
@@ -97,6 +114,9 @@ const ResultsView = () => {
         return `${apiBaseUrl}${filePath.startsWith('/') ? filePath : `/${filePath}`}`;
     };
 
+    // Resized WebP derivative instead of the full-resolution original
+    const getPreviewUrl = (imageId, size = 'large') => `${apiBaseUrl}/api/images/${imageId}/preview?size=${size}`;
+
     const getStatusBadge = (status) => {
         switch (status) {
             case 'pending':
@@ -135,6 +155,16 @@ const ResultsView = () => {
                         <span className={`px-3 py-1 rounded-full text-xs md:text-sm font-mono ${getStatusBadge(batch.status)}`}>
                             {batch.status?.toUpperCase?.() || 'UNKNOWN'}
                         </span>
+                        {(batch.status === 'error' || (batch.status === 'done' && batch.error_message)) && (
+                            <button
+                                onClick={handleRetry}
+                                disabled={retrying}
+                                title={batch.error_message || ''}
+                                className="px-4 py-2 bg-cyber-card border border-red-400/50 text-red-400 rounded-lg hover:border-red-400 transition-all w-full sm:w-auto text-sm md:text-base"
+                            >
+                                {retrying ? 'Retrying...' : 'Retry Failed Pages'}
+                            </button>
+                        )}
                         <button
                             onClick={() => handleExport('csv')}
                             className="px-4 py-2 bg-cyber-card border border-cyber-border rounded-lg hover:border-cyber-primary/50 transition-all w-full sm:w-auto text-sm md:text-base"
@@ -167,12 +197,14 @@ const ResultsView = () => {
 
                             {currentImage && (
                                 <div className="relative group rounded-lg overflow-hidden border border-cyber-border">
-                                    <img
-                                        src={getImageUrl(currentImage.file_path)}
-                                        alt={`Page ${selectedImageIndex + 1}`}
-                                        className="w-full h-auto object-contain"
-                                    />
-                                    <div className="absolute inset-0 bg-gradient-to-t from-slate-900/60 to-transparent opacity-0 group-hover:opacity-100 transition-opacity flex items-end p-4">
+                                    <a href={getImageUrl(currentImage.file_path)} target="_blank" rel="noopener noreferrer">
+                                        <img
+                                            src={getPreviewUrl(currentImage.id)}
+                                            alt={`Page ${selectedImageIndex + 1}`}
+                                            className="w-full h-auto object-contain"
+                                        />
+                                    </a>
+                                    <div className="absolute inset-0 bg-gradient-to-t from-slate-900/60 to-transparent opacity-0 group-hover:opacity-100 transition-opacity flex items-end p-4 pointer-events-none">
                                         <p className="text-sm font-mono text-cyber-primary">
                                             {overallConfidence(currentImage.confidence) ? `Confidence: ${overallConfidence(currentImage.confidence)}%` : 'Confidence: N/A'}
                                         </p>
@@ -194,7 +226,8 @@ const ResultsView = () => {
                                                     }`}
                                             >
                                                 <img
-                                                    src={getImageUrl(img.file_path)}
+                                                    src={getPreviewUrl(img.id, 'thumb')}
+                                                    loading="lazy"
                                                     alt={`Page ${idx + 1}`}
                                                     className="w-full h-full object-cover"
                                                 />
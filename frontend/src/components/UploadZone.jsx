@@ -18,9 +18,12 @@ export default function UploadZone() {
 
     const { getRootProps, getInputProps, isDragActive } = useDropzone({
         onDrop,
-        accept: { 'image/*': [] }
+        accept: { 'image/*': [], 'application/pdf': ['.pdf'] }
     });
 
+    // Multi-page scans are rasterized on the server; browsers can't preview them inline
+    const isDocument = (file) => ['application/pdf', 'image/tiff'].includes(file.type);
+
     const handleUpload = async () => {
         if (files.length === 0) return;
 
@@ -31,7 +34,9 @@ export default function UploadZone() {
                 throw new Error('Upload succeeded but no batch id returned');
             }
 
-            setUploadStatus('已上傳，正在識別...');
+            setUploadStatus(result.estimated_completion
+                ? `已上傳，預計 ${new Date(result.estimated_completion + 'Z').toLocaleTimeString()} 完成`
+                : '已上傳，正在識別...');
 
             // 等待處理完成再跳轉，避免 undefined/空白頁
             const batchId = result.id;
@@ -49,7 +54,12 @@ export default function UploadZone() {
             navigate(`/results/${batchId}`);
         } catch (error) {
             console.error("Upload failed:", error);
-            alert("上傳失敗，請重試");
+            if (error.response?.status === 429) {
+                const retryAfter = Number(error.response.headers['retry-after'] || 0);
+                alert(`系統繁忙，請約 ${Math.ceil(retryAfter / 60)} 分鐘後再上傳`);
+            } else {
+                alert("上傳失敗，請重試");
+            }
         } finally {
             setUploading(false);
             setUploadStatus('');
@@ -138,11 +148,17 @@ export default function UploadZone() {
                                 <div className="mt-8 grid grid-cols-2 md:grid-cols-4 gap-4">
                                     {files.map((file, index) => (
                                         <div key={index} className="relative group">
-                                            <img
-                                                src={file.preview}
-                                                alt={file.name}
-                                                className="w-full h-24 object-cover rounded-lg border border-cyber-border group-hover:border-cyber-primary/50 transition-all"
-                                            />
+                                            {isDocument(file) ? (
+                                                <div className="w-full h-24 flex items-center justify-center rounded-lg border border-cyber-border group-hover:border-cyber-primary/50 transition-all text-xs font-mono text-cyber-muted p-2 text-center break-all">
+                                                    {file.name}
+                                                </div>
+                                            ) : (
+                                                <img
+                                                    src={file.preview}
+                                                    alt={file.name}
+                                                    className="w-full h-24 object-cover rounded-lg border border-cyber-border group-hover:border-cyber-primary/50 transition-all"
+                                                />
+                                            )}
                                             <button
                                                 onClick={(e) => {
                                                     e.stopPropagation();